@@ -0,0 +1,142 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import UserActivity
+
+logger = logging.getLogger(__name__)
+
+def get_ingest_config() -> Dict[str, Any]:
+    """Return the activity ingest settings merged over their defaults"""
+    config = {
+        'ENABLED': True,  # False writes each event synchronously (useful in tests)
+        'MAX_BATCH': 500,
+        'FLUSH_INTERVAL': 2.0,  # seconds
+        'SPOOL_PATH': os.path.join(settings.BASE_DIR, 'var', 'activity_spool.jsonl'),
+    }
+    config.update(getattr(settings, 'ACTIVITY_INGEST', {}))
+    return config
+
+class ActivityIngestor:
+    """Buffers UserActivity events in process and writes them with bulk_create"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or get_ingest_config()
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        atexit.register(self.flush)
+
+    def record(self, user_id: int, activity_type: str, description: str, metadata: Dict[str, Any] = None):
+        self.record_many([{
+            'user_id': user_id,
+            'activity_type': activity_type,
+            'description': description,
+            'metadata': metadata or {},
+        }])
+
+    def record_many(self, events: List[Dict[str, Any]]):
+        """Queue events; the caller never waits on the database"""
+        now = timezone.now()
+        events = [
+            {**event, 'created_at': event.get('created_at') or now, 'event_id': event.get('event_id') or uuid.uuid4()}
+            for event in events
+        ]
+        if not self.config['ENABLED']:
+            self._write(events)
+            return
+
+        with self._lock:
+            self._buffer.extend(events)
+            full = len(self._buffer) >= self.config['MAX_BATCH']
+        self._ensure_worker()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of events handled"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            if not events:
+                return 0
+            try:
+                self._write(events)
+            except Exception as e:
+                logger.error(f"Error writing {len(events)} activities, spooling to disk: {e}")
+                self._spool(events)
+            return len(events)
+
+    def replay_spool(self) -> int:
+        """Re-ingest events that were spooled while the database was unavailable.
+
+        Also picks up spools a previous replay claimed but didn't finish. Events are
+        inserted by event_id with ON CONFLICT DO NOTHING, so replaying a file again
+        after a partial write doesn't duplicate rows.
+        """
+        path = self.config['SPOOL_PATH']
+        pending = sorted(glob.glob(f"{glob.escape(path)}.*.replay"))
+        if os.path.exists(path):
+            replaying = f"{path}.{os.getpid()}.{int(time.time())}.replay"
+            os.replace(path, replaying)
+            pending.append(replaying)
+
+        count = 0
+        for replaying in pending:
+            with open(replaying, encoding='utf-8') as spool:
+                events = [json.loads(line) for line in spool if line.strip()]
+            for event in events:
+                event['created_at'] = parse_datetime(event['created_at'])
+            for start in range(0, len(events), self.config['MAX_BATCH']):
+                self._write(events[start:start + self.config['MAX_BATCH']])
+            os.remove(replaying)
+            count += len(events)
+        return count
+
+    def _write(self, events: List[Dict[str, Any]]):
+        UserActivity.objects.bulk_create(
+            [UserActivity(**event) for event in events],
+            batch_size=self.config['MAX_BATCH'],
+            ignore_conflicts=True
+        )
+
+    def _spool(self, events: List[Dict[str, Any]]):
+        path = self.config['SPOOL_PATH']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as spool:
+            for event in events:
+                spool.write(json.dumps({
+                    **event,
+                    'created_at': event['created_at'].isoformat(),
+                    'event_id': str(event['event_id']),
+                }) + '\n')
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='activity-ingest', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.config['FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            close_old_connections()
+            started = time.monotonic()
+            count = self.flush()
+            if count:
+                logger.debug(f"Flushed {count} activities in {time.monotonic() - started:.3f}s")
+
+activity_ingestor = ActivityIngestor()
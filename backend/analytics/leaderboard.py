@@ -0,0 +1,270 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.utils import timezone
+
+# Board name -> UserProgress field it ranks
+BOARDS = {
+    'score': 'average_interview_score',
+    'streak': 'current_streak_days',
+}
+# week boards score only this ISO week: 'score' is the mean of the week's assessment
+# scores, 'streak' the number of distinct days the user was active
+PERIODS = ('alltime', 'week')
+MAX_LIMIT = 100
+
+def get_leaderboard_config() -> Dict[str, Any]:
+    """Return the leaderboard settings merged over their defaults"""
+    config = {
+        'BACKEND': None,
+        'KEY_PREFIX': 'leaderboard',
+        'WEEKLY_TTL': 15 * 24 * 60 * 60,  # seconds; keeps last week's board readable
+    }
+    config.update(getattr(settings, 'LEADERBOARD', {}))
+    if not config['BACKEND']:
+        layer = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {})
+        config['BACKEND'] = 'redis' if 'Redis' in layer.get('BACKEND', '') else 'memory'
+    return config
+
+class InMemorySortedSetStore:
+    """Process-local stand-in for Redis sorted sets, used in tests and development.
+
+    Members are kept in ascending (score, member) order and read from the end, so
+    ties break by descending member like ZREVRANK/ZREVRANGE.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self._scores: Dict[str, Dict[str, float]] = {}
+        self._ordered: Dict[str, List[Tuple[float, str]]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, member: str, score: float):
+        with self._lock:
+            self._set(key, member, score)
+
+    def add_new(self, key: str, member: str, score: float) -> bool:
+        with self._lock:
+            if member in self._scores.get(key, {}):
+                return False
+            self._set(key, member, score)
+            return True
+
+    def incr(self, key: str, member: str, amount: float) -> float:
+        with self._lock:
+            score = self._scores.get(key, {}).get(member, 0.0) + amount
+            self._set(key, member, score)
+            return score
+
+    def _set(self, key: str, member: str, score: float):
+        scores = self._scores.setdefault(key, {})
+        ordered = self._ordered.setdefault(key, [])
+        if member in scores:
+            ordered.pop(bisect_left(ordered, (scores[member], member)))
+        scores[member] = score
+        insort(ordered, (score, member))
+
+    def rank(self, key: str, member: str) -> Optional[int]:
+        with self._lock:
+            score = self._scores.get(key, {}).get(member)
+            if score is None:
+                return None
+            ordered = self._ordered[key]
+            return len(ordered) - 1 - bisect_left(ordered, (score, member))
+
+    def score(self, key: str, member: str) -> Optional[float]:
+        with self._lock:
+            return self._scores.get(key, {}).get(member)
+
+    def range(self, key: str, start: int, stop: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            ordered = self._ordered.get(key, [])
+            end = len(ordered) - start
+            return [(member, score) for score, member in reversed(ordered[max(0, end - (stop - start + 1)):max(0, end)])]
+
+    def size(self, key: str) -> int:
+        with self._lock:
+            return len(self._scores.get(key, {}))
+
+    def replace(self, key: str, items: List[Tuple[str, float]], ttl: Optional[int] = None):
+        with self._lock:
+            self._scores[key] = dict(items)
+            self._ordered[key] = sorted((score, member) for member, score in items)
+
+    def expire(self, key: str, ttl: int):
+        pass
+
+class RedisSortedSetStore:
+    """Leaderboards as Redis ZSETs on the channel-layer Redis"""
+
+    def __init__(self, config: Dict[str, Any]):
+        import redis
+
+        host, port = settings.CHANNEL_LAYERS['default']['CONFIG']['hosts'][0]
+        self.client = redis.Redis(host=host, port=port)
+
+    def add(self, key: str, member: str, score: float):
+        self.client.zadd(key, {member: score})
+
+    def add_new(self, key: str, member: str, score: float) -> bool:
+        return bool(self.client.zadd(key, {member: score}, nx=True))
+
+    def incr(self, key: str, member: str, amount: float) -> float:
+        return self.client.zincrby(key, amount, member)
+
+    def rank(self, key: str, member: str) -> Optional[int]:
+        return self.client.zrevrank(key, member)
+
+    def score(self, key: str, member: str) -> Optional[float]:
+        return self.client.zscore(key, member)
+
+    def range(self, key: str, start: int, stop: int) -> List[Tuple[str, float]]:
+        return [
+            (member.decode(), score)
+            for member, score in self.client.zrevrange(key, start, stop, withscores=True)
+        ]
+
+    def size(self, key: str) -> int:
+        return self.client.zcard(key)
+
+    def replace(self, key: str, items: List[Tuple[str, float]], ttl: Optional[int] = None):
+        # Build aside and swap in atomically so readers never see a half-built board
+        staging = f"{key}:rebuild"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(staging)
+        for start in range(0, len(items), 10000):
+            pipe.zadd(staging, dict(items[start:start + 10000]))
+        pipe.execute()
+        if items:
+            self.client.rename(staging, key)
+            if ttl:
+                self.client.expire(key, ttl)
+        else:
+            self.client.delete(key)
+
+    def expire(self, key: str, ttl: int):
+        self.client.expire(key, ttl)
+
+class LeaderboardService:
+    """Weekly and all-time rankings over UserProgress, served from sorted sets"""
+
+    _store = None
+
+    def __init__(self):
+        self.config = get_leaderboard_config()
+
+    @property
+    def store(self):
+        if LeaderboardService._store is None:
+            if self.config['BACKEND'] == 'redis':
+                LeaderboardService._store = RedisSortedSetStore(self.config)
+            else:
+                LeaderboardService._store = InMemorySortedSetStore(self.config)
+        return LeaderboardService._store
+
+    def key(self, board: str, period: str, when=None) -> str:
+        if period == 'week':
+            year, week, _ = self._day(when).isocalendar()
+            return f"{self.config['KEY_PREFIX']}:{board}:week:{year}-{week:02d}"
+        return f"{self.config['KEY_PREFIX']}:{board}:alltime"
+
+    @staticmethod
+    def _day(when=None):
+        if when is None or hasattr(when, 'tzinfo'):
+            return timezone.localdate(when)
+        return when
+
+    def update(self, user_progress):
+        """Record the user's current values on the all-time boards"""
+        member = str(user_progress.user_id)
+        for board, field in BOARDS.items():
+            self.store.add(self.key(board, 'alltime'), member, float(getattr(user_progress, field)))
+
+    def record_assessment(self, user_id: int, score: float, when=None):
+        """Fold an assessment score into the user's mean for that week"""
+        member = str(user_id)
+        key = self.key('score', 'week', when)
+        total = self.store.incr(f"{key}:total", member, float(score))
+        count = self.store.incr(f"{key}:count", member, 1)
+        self.store.add(key, member, total / count)
+        for weekly in (key, f"{key}:total", f"{key}:count"):
+            self.store.expire(weekly, self.config['WEEKLY_TTL'])
+
+    def record_active_day(self, user_id: int, day):
+        """Count the day once towards the user's active days that week"""
+        key = self.key('streak', 'week', day)
+        if self.store.add_new(f"{key}:days", f"{user_id}:{self._day(day).isoformat()}", 0):
+            self.store.incr(key, str(user_id), 1)
+        for weekly in (key, f"{key}:days"):
+            self.store.expire(weekly, self.config['WEEKLY_TTL'])
+
+    def top(self, board: str, period: str, limit: int = 10) -> List[Dict[str, Any]]:
+        limit = max(1, min(limit, MAX_LIMIT))
+        return self._entries(self.store.range(self.key(board, period), 0, limit - 1), 0)
+
+    def rank(self, board: str, period: str, user_id: int) -> Optional[Dict[str, Any]]:
+        key = self.key(board, period)
+        rank = self.store.rank(key, str(user_id))
+        if rank is None:
+            return None
+        return {
+            'rank': rank + 1,
+            'score': self.store.score(key, str(user_id)),
+            'out_of': self.store.size(key),
+        }
+
+    def around(self, board: str, period: str, user_id: int, radius: int = 5) -> List[Dict[str, Any]]:
+        key = self.key(board, period)
+        rank = self.store.rank(key, str(user_id))
+        if rank is None:
+            return []
+        start = max(0, rank - radius)
+        return self._entries(self.store.range(key, start, rank + radius), start)
+
+    def rebuild(self, progress_rows) -> int:
+        """Replace the all-time boards from UserProgress value rows"""
+        rows = list(progress_rows)
+        for board, field in BOARDS.items():
+            self.store.replace(
+                self.key(board, 'alltime'),
+                [(str(row['user_id']), float(row[field])) for row in rows]
+            )
+        return len(rows)
+
+    def rebuild_week(self, assessment_rows, active_days, when=None) -> int:
+        """Replace a week's boards from (user_id, score total, score count) rows and
+        (user_id, day) pairs"""
+        ttl = self.config['WEEKLY_TTL']
+        score_key = self.key('score', 'week', when)
+        totals = [(str(user_id), float(total), count) for user_id, total, count in assessment_rows if count]
+        self.store.replace(f"{score_key}:total", [(member, total) for member, total, _ in totals], ttl=ttl)
+        self.store.replace(f"{score_key}:count", [(member, float(count)) for member, _, count in totals], ttl=ttl)
+        self.store.replace(score_key, [(member, total / count) for member, total, count in totals], ttl=ttl)
+
+        streak_key = self.key('streak', 'week', when)
+        days = {(user_id, day) for user_id, day in active_days}
+        per_user: Dict[str, float] = {}
+        for user_id, _ in days:
+            per_user[str(user_id)] = per_user.get(str(user_id), 0.0) + 1
+        self.store.replace(f"{streak_key}:days", [(f"{user_id}:{day.isoformat()}", 0.0) for user_id, day in days], ttl=ttl)
+        self.store.replace(streak_key, list(per_user.items()), ttl=ttl)
+        return len(set(member for member, _, _ in totals) | set(per_user))
+
+    @staticmethod
+    def _entries(members: List[Tuple[str, float]], offset: int) -> List[Dict[str, Any]]:
+        from django.contrib.auth import get_user_model
+
+        names = dict(
+            get_user_model().objects.filter(
+                id__in=[int(member) for member, _ in members]
+            ).values_list('id', 'username')
+        )
+        return [
+            {
+                'rank': offset + position + 1,
+                'user_id': int(member),
+                'username': names.get(int(member)),
+                'score': score,
+            }
+            for position, (member, score) in enumerate(members)
+        ]
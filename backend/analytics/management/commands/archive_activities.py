@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from analytics.models import UserActivity, UserActivityArchive
+
+class Command(BaseCommand):
+    help = 'Move UserActivity rows older than the configured age into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int,
+            default=getattr(settings, 'ACTIVITY_ARCHIVE_AFTER_DAYS', 180)
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        started = time.monotonic()
+        moved = 0
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    UserActivity.objects.select_for_update(skip_locked=True)
+                    .filter(created_at__lt=cutoff)
+                    .order_by('id')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                UserActivityArchive.objects.bulk_create([
+                    UserActivityArchive(
+                        user_id=activity.user_id,
+                        activity_type=activity.activity_type,
+                        description=activity.description,
+                        metadata=activity.metadata,
+                        created_at=activity.created_at
+                    )
+                    for activity in batch
+                ])
+                UserActivity.objects.filter(id__in=[activity.id for activity in batch]).delete()
+            moved += len(batch)
+            self.stdout.write(f"\rArchived {moved} activities", ending='')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} activities older than {cutoff:%Y-%m-%d} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
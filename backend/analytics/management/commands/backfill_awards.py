@@ -0,0 +1,137 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from analytics.models import Badge, Title, UserProgress, UserBadge, UserActivity
+from analytics.services import BADGE_CRITERIA_FIELDS, TITLE_CRITERIA_FIELDS
+
+def table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+def column(model, field):
+    return connection.ops.quote_name(model._meta.get_field(field).column)
+
+class Command(BaseCommand):
+    help = 'Award badges and titles to every user who already qualifies, using set-based SQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--badge', type=int, action='append', help='Only backfill these badge ids')
+        parser.add_argument('--title', type=int, action='append', help='Only backfill these title ids')
+        parser.add_argument('--skip-badges', action='store_true')
+        parser.add_argument('--skip-titles', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=50000, help='UserProgress ids per statement')
+
+    def handle(self, *args, **options):
+        bounds = UserProgress.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write('No user progress rows to backfill.')
+            return
+        self.id_ranges = [
+            (start, min(start + options['batch_size'] - 1, bounds['high']))
+            for start in range(bounds['low'], bounds['high'] + 1, options['batch_size'])
+        ]
+
+        if not options['skip_badges']:
+            badges = Badge.objects.all()
+            if options['badge']:
+                badges = badges.filter(id__in=options['badge'])
+            for badge in badges:
+                self.backfill(badge, self.badge_sql(badge))
+
+        if not options['skip_titles']:
+            # Highest level first, so each user lands on the best title they qualify
+            # for and lower titles no longer match the level guard.
+            titles = Title.objects.order_by('-level')
+            if options['title']:
+                titles = titles.filter(id__in=options['title'])
+            for title in titles:
+                self.backfill(title, self.title_sql(title))
+
+    def backfill(self, award, sql):
+        if sql is None:
+            self.stderr.write(f"Skipping {award}: unsupported criteria {award.criteria!r}")
+            return
+
+        started = time.monotonic()
+        total = 0
+        for number, (low, high) in enumerate(self.id_ranges, start=1):
+            query, params = sql
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(query, {**params, 'low': low, 'high': high})
+                total += cursor.rowcount
+            self.stdout.write(
+                f"\r{award}: batch {number}/{len(self.id_ranges)}, {total} awarded",
+                ending=''
+            )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"{award}: awarded to {total} users in {time.monotonic() - started:.1f}s"
+        ))
+
+    def threshold(self, criteria, fields):
+        """SQL form of compile_criteria: the same types and thresholds the live checks accept"""
+        criteria = criteria or {}
+        if criteria.get('type') not in fields:
+            return None
+        field, key = fields[criteria['type']]
+        return column(UserProgress, field), criteria.get(key, 0)
+
+    def badge_sql(self, badge):
+        threshold = self.threshold(badge.criteria, BADGE_CRITERIA_FIELDS)
+        if threshold is None:
+            return None
+        field, value = threshold
+        # The unique (user_progress, badge) constraint makes reruns no-ops
+        query = f"""
+            WITH awarded AS (
+                INSERT INTO {table(UserBadge)} ({column(UserBadge, 'user_progress')}, {column(UserBadge, 'badge')},
+                                                {column(UserBadge, 'awarded_at')}, {column(UserBadge, 'shared_on_facebook')})
+                SELECT up.id, %(award_id)s, NOW(), FALSE
+                FROM {table(UserProgress)} up
+                WHERE up.{field} >= %(threshold)s AND up.id BETWEEN %(low)s AND %(high)s
+                ON CONFLICT DO NOTHING
+                RETURNING {column(UserBadge, 'user_progress')} AS user_progress_id
+            )
+            INSERT INTO {table(UserActivity)} ({column(UserActivity, 'user')}, {column(UserActivity, 'activity_type')},
+                                               {column(UserActivity, 'description')}, {column(UserActivity, 'metadata')},
+                                               {column(UserActivity, 'created_at')})
+            SELECT up.{column(UserProgress, 'user')}, 'badge', %(description)s, %(metadata)s::jsonb, NOW()
+            FROM awarded JOIN {table(UserProgress)} up ON up.id = awarded.user_progress_id
+        """
+        return query, {
+            'award_id': badge.id,
+            'threshold': value,
+            'description': f"Earned badge: {badge.name}",
+            'metadata': json.dumps({'badge_id': badge.id}),
+        }
+
+    def title_sql(self, title):
+        threshold = self.threshold(title.criteria, TITLE_CRITERIA_FIELDS)
+        if threshold is None:
+            return None
+        field, value = threshold
+        query = f"""
+            WITH promoted AS (
+                UPDATE {table(UserProgress)} up
+                SET {column(UserProgress, 'current_title')} = %(award_id)s,
+                    {column(UserProgress, 'updated_at')} = NOW()
+                WHERE up.{field} >= %(threshold)s AND up.id BETWEEN %(low)s AND %(high)s
+                  AND (up.{column(UserProgress, 'current_title')} IS NULL
+                       OR (SELECT t.level FROM {table(Title)} t
+                           WHERE t.id = up.{column(UserProgress, 'current_title')}) < %(level)s)
+                RETURNING up.{column(UserProgress, 'user')} AS user_id
+            )
+            INSERT INTO {table(UserActivity)} ({column(UserActivity, 'user')}, {column(UserActivity, 'activity_type')},
+                                               {column(UserActivity, 'description')}, {column(UserActivity, 'metadata')},
+                                               {column(UserActivity, 'created_at')})
+            SELECT promoted.user_id, 'title', %(description)s, %(metadata)s::jsonb, NOW()
+            FROM promoted
+        """
+        return query, {
+            'award_id': title.id,
+            'threshold': value,
+            'level': title.level,
+            'description': f"Earned title: {title.name}",
+            'metadata': json.dumps({'title_id': title.id}),
+        }
@@ -0,0 +1,38 @@
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from analytics.leaderboard import BOARDS, LeaderboardService
+from analytics.models import UserProgress
+from interviews.models import Interview, InterviewAssessment
+from training.models import TrainingSession
+
+class Command(BaseCommand):
+    help = 'Rebuild the all-time and current-week leaderboard sorted sets'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        service = LeaderboardService()
+        rows = UserProgress.objects.values('user_id', *BOARDS.values()).iterator(chunk_size=10000)
+        count = service.rebuild(rows)
+
+        today = timezone.localdate()
+        week_start = timezone.make_aware(datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time()))
+        assessments = InterviewAssessment.objects.filter(created_at__gte=week_start).values_list(
+            'interview__user_id'
+        ).annotate(total=Sum('overall_score'), count=Count('id')).order_by()
+        active_days = list(
+            Interview.objects.filter(is_completed=True, completed_at__gte=week_start)
+            .annotate(day=TruncDate('completed_at')).values_list('user_id', 'day').distinct()
+        ) + list(
+            TrainingSession.objects.filter(is_completed=True, end_time__gte=week_start)
+            .annotate(day=TruncDate('end_time')).values_list('user_id', 'day').distinct()
+        )
+        weekly = service.rebuild_week(assessments, active_days)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt leaderboards for {count} users ({weekly} active this week) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,124 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from analytics.models import UserProgress
+from interviews.models import Interview, InterviewAssessment
+from training.models import TrainingSession
+
+COUNTER_FIELDS = [
+    'total_interviews', 'assessment_count', 'average_interview_score',
+    'training_seconds', 'total_training_hours', 'current_streak_days',
+    'longest_streak_days', 'last_active_on',
+]
+
+class Command(BaseCommand):
+    help = 'Recompute UserProgress counters from source tables and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        checked = fixed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                UserProgress.objects.filter(id__gt=last_id).order_by('id')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            drifted = self.reconcile(batch)
+            checked += len(batch)
+            fixed += len(drifted)
+            if drifted and not options['dry_run']:
+                # bulk_update skips auto_now; segment refreshes find changed users by updated_at
+                now = timezone.now()
+                for progress in drifted:
+                    progress.updated_at = now
+                UserProgress.objects.bulk_update(drifted, COUNTER_FIELDS + ['updated_at'])
+            self.stdout.write(f"\rChecked {checked}, drifted {fixed}", ending='')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {checked} progress rows in {time.monotonic() - started:.1f}s; "
+            f"{fixed} {'would be ' if options['dry_run'] else ''}corrected"
+        ))
+
+    def reconcile(self, batch):
+        """Return the rows whose stored counters differ from the recomputed values"""
+        user_ids = [progress.user_id for progress in batch]
+
+        interviews = dict(
+            Interview.objects.filter(user_id__in=user_ids, is_completed=True)
+            .values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+        )
+        assessments = {
+            row['interview__user_id']: row
+            for row in InterviewAssessment.objects.filter(interview__user_id__in=user_ids)
+            .values('interview__user_id').annotate(count=Count('id'), average=Avg('overall_score'))
+        }
+        training = dict(
+            TrainingSession.objects.filter(
+                user_id__in=user_ids, is_completed=True, end_time__isnull=False
+            ).values('user_id').annotate(
+                duration=Sum(ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField()))
+            ).values_list('user_id', 'duration')
+        )
+
+        active_days = defaultdict(set)
+        for user_id, day in Interview.objects.filter(
+            user_id__in=user_ids, is_completed=True, completed_at__isnull=False
+        ).annotate(day=TruncDate('completed_at')).values_list('user_id', 'day').distinct():
+            active_days[user_id].add(day)
+        for user_id, day in TrainingSession.objects.filter(
+            user_id__in=user_ids, is_completed=True, end_time__isnull=False
+        ).annotate(day=TruncDate('end_time')).values_list('user_id', 'day').distinct():
+            active_days[user_id].add(day)
+
+        drifted = []
+        for progress in batch:
+            user_id = progress.user_id
+            assessment = assessments.get(user_id, {'count': 0, 'average': 0})
+            duration = training.get(user_id) or timedelta()
+            seconds = max(0, int(duration.total_seconds()))
+            current, longest, last_day = self.streaks(active_days[user_id])
+            expected = {
+                'total_interviews': interviews.get(user_id, 0),
+                'assessment_count': assessment['count'],
+                'average_interview_score': float(assessment['average'] or 0),
+                'training_seconds': seconds,
+                'total_training_hours': seconds // 3600,
+                'current_streak_days': current,
+                'longest_streak_days': max(longest, progress.longest_streak_days),
+                'last_active_on': last_day,
+            }
+            changed = False
+            for field, value in expected.items():
+                stored = getattr(progress, field)
+                if isinstance(value, float) and abs((stored or 0) - value) < 1e-6:
+                    continue
+                if stored != value:
+                    setattr(progress, field, value)
+                    changed = True
+            if changed:
+                drifted.append(progress)
+        return drifted
+
+    @staticmethod
+    def streaks(days):
+        """Current streak (still alive if last active today or yesterday), longest streak, last day"""
+        if not days:
+            return 0, 0, None
+        ordered = sorted(days)
+        longest = run = 1
+        for previous, day in zip(ordered, ordered[1:]):
+            run = run + 1 if day - previous == timedelta(days=1) else 1
+            longest = max(longest, run)
+        current = run if ordered[-1] >= timezone.localdate() - timedelta(days=1) else 0
+        return current, longest, ordered[-1]
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from analytics.ingest import activity_ingestor
+
+class Command(BaseCommand):
+    help = 'Write activities spooled to disk during a database outage back into UserActivity'
+
+    def handle(self, *args, **options):
+        count = activity_ingestor.replay_spool()
+        self.stdout.write(self.style.SUCCESS(f"Replayed {count} spooled activities"))
@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from analytics.services import RollupService
+
+class Command(BaseCommand):
+    help = 'Fold Interview and UserActivity rows added since the last run into ActivityRollup'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        processed = RollupService.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f"{source}: watermark advanced {count} ids" for source, count in processed.items())
+            + f" in {time.monotonic() - started:.1f}s"
+        ))
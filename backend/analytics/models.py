@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class Badge(models.Model):
@@ -29,11 +30,14 @@ class UserProgress(models.Model):
     average_interview_score = models.FloatField(default=0)
     current_streak_days = models.IntegerField(default=0)
     longest_streak_days = models.IntegerField(default=0)
+    assessment_count = models.IntegerField(default=0)  # Denominator for average_interview_score
+    training_seconds = models.BigIntegerField(default=0)  # Exact total behind total_training_hours
+    last_active_on = models.DateField(null=True, blank=True)  # Day the current streak was last extended
     badges = models.ManyToManyField(Badge, through='UserBadge')
     current_title = models.ForeignKey(Title, null=True, blank=True, on_delete=models.SET_NULL)
     last_activity_date = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     session_count = models.IntegerField(default=0)  # For CSAT tracking
     last_csat_prompt = models.DateTimeField(null=True, blank=True)
 
@@ -65,6 +69,9 @@ class UserBadge(models.Model):
     awarded_at = models.DateTimeField(auto_now_add=True)
     shared_on_facebook = models.BooleanField(default=False)
 
+    class Meta:
+        unique_together = ('user_progress', 'badge')
+
     def __str__(self):
         return f"{self.user_progress.user.email} - {self.badge.name}"
 
@@ -82,11 +89,37 @@ class UserActivity(models.Model):
     activity_type = models.CharField(max_length=20, choices=ACTIVITY_TYPES)
     description = models.TextField()
     metadata = models.JSONField(default=dict)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the ingest buffer flushes it
+    created_at = models.DateTimeField(default=timezone.now)
+    # Assigned by the ingest buffer so a replayed spool can't insert an event twice
+    event_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's feed, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='activity_user_feed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.activity_type}"
 
+class UserActivityArchive(models.Model):
+    """Cold tier for UserActivity rows older than ACTIVITY_ARCHIVE_AFTER_DAYS"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    activity_type = models.CharField(max_length=20, choices=UserActivity.ACTIVITY_TYPES)
+    description = models.TextField()
+    metadata = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='activity_archive_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.activity_type} (archived)"
+
 class UserFeedback(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     rating = models.IntegerField()
@@ -97,3 +130,48 @@ class UserFeedback(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {self.rating} stars"
+
+class ActivityRollup(models.Model):
+    """Pre-aggregated hourly/daily counts for analytics dashboards"""
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+    SOURCE_CHOICES = [
+        ('activity', 'User Activity'),
+        ('interview', 'Interview'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    dimension = models.CharField(max_length=30)  # e.g. activity_type, interviewer_type, tier
+    value = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+    total = models.BigIntegerField(default=0)  # Sum of the source's measure, e.g. interview minutes
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'granularity', 'bucket_start', 'dimension', 'value'],
+                name='unique_activity_rollup_bucket'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['source', 'dimension', 'granularity', 'bucket_start'], name='rollup_query_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.dimension}={self.value} @ {self.bucket_start} ({self.granularity})"
+
+class RollupWatermark(models.Model):
+    """Highest source row id already folded into ActivityRollup"""
+    source = models.CharField(max_length=20, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    # Max id seen at pending_at; folded once it is ACTIVITY_ROLLUP_LAG_SECONDS old
+    pending_id = models.BigIntegerField(default=0)
+    pending_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.last_id}"
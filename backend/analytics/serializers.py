@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import UserProgress, UserActivity, UserFeedback
+from .models import UserProgress, UserActivity, UserActivityArchive, UserFeedback, ActivityRollup
 
 class UserProgressSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,6 +21,12 @@ class UserActivitySerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+class UserActivityArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserActivityArchive
+        fields = ('id', 'user', 'activity_type', 'description', 'metadata', 'created_at')
+        read_only_fields = fields
+
 class UserFeedbackSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserFeedback
@@ -35,4 +41,10 @@ class UserFeedbackCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserFeedback
         fields = ('rating', 'feedback', 'session_type', 'session_id')
-        read_only_fields = ('user', 'created_at') 
\ No newline at end of file
+        read_only_fields = ('user', 'created_at')
+
+class ActivityRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ActivityRollup
+        fields = ('bucket_start', 'granularity', 'source', 'dimension', 'value', 'count', 'total')
+        read_only_fields = fields
@@ -1,44 +1,112 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, F, Max, When
+from django.db.models.functions import Greatest
 from django.utils import timezone
-from .models import Badge, Title, UserProgress, UserBadge, UserActivity
+from .ingest import activity_ingestor
+from .leaderboard import LeaderboardService
+from interviews.models import Interview
+from .models import (
+    Badge, Title, UserProgress, UserBadge, UserActivity,
+    ActivityRollup, RollupWatermark
+)
+
+logger = logging.getLogger(__name__)
+
+# Criteria type -> (UserProgress field, criteria key holding the threshold)
+BADGE_CRITERIA_FIELDS = {
+    'interview_count': ('total_interviews', 'count'),
+    'streak': ('current_streak_days', 'days'),
+    'score': ('average_interview_score', 'score'),
+}
+TITLE_CRITERIA_FIELDS = {
+    'interview_score': ('average_interview_score', 'score'),
+    'training_hours': ('total_training_hours', 'hours'),
+}
+
+def compile_criteria(criteria, fields=BADGE_CRITERIA_FIELDS):
+    """Turn a criteria dict into a predicate over UserProgress, or None if unsupported"""
+    criteria = criteria or {}
+    if criteria.get('type') not in fields:
+        return None
+    field, key = fields[criteria['type']]
+    threshold = criteria.get(key, 0)
+    return lambda user_progress: getattr(user_progress, field) >= threshold
+
+class BadgeEngine:
+    """Process-wide cache of compiled badge predicates, invalidated on Badge changes"""
+    VERSION_KEY = 'analytics:badge_engine:version'
+
+    _badges = None
+    _version = None
+
+    @classmethod
+    def invalidate(cls):
+        # Bump the shared version so every worker recompiles on its next check
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+        cls._badges = None
+
+    @classmethod
+    def compiled_badges(cls):
+        version = cache.get(cls.VERSION_KEY, 0)
+        if cls._badges is None or cls._version != version:
+            compiled = []
+            for badge in Badge.objects.only('id', 'name', 'criteria'):
+                predicate = compile_criteria(badge.criteria)
+                if predicate is not None:
+                    compiled.append((badge, predicate))
+            cls._badges = compiled
+            cls._version = version
+        return cls._badges
 
 class BadgeService:
     @staticmethod
     def check_and_award_badges(user_progress):
         """Check and award badges based on user progress"""
-        badges = Badge.objects.all()
-        for badge in badges:
-            if not UserBadge.objects.filter(
-                user_progress=user_progress,
-                badge=badge
-            ).exists():
-                if BadgeService._check_badge_criteria(user_progress, badge):
-                    BadgeService._award_badge(user_progress, badge)
-
-    @staticmethod
-    def _check_badge_criteria(user_progress, badge):
-        """Check if user meets badge criteria"""
-        criteria = badge.criteria
-        if criteria.get('type') == 'interview_count':
-            return user_progress.total_interviews >= criteria.get('count', 0)
-        elif criteria.get('type') == 'streak':
-            return user_progress.current_streak_days >= criteria.get('days', 0)
-        elif criteria.get('type') == 'score':
-            return user_progress.average_interview_score >= criteria.get('score', 0)
-        return False
+        awarded = set(
+            UserBadge.objects.filter(user_progress=user_progress).values_list('badge_id', flat=True)
+        )
+        earned = [
+            badge for badge, predicate in BadgeEngine.compiled_badges()
+            if badge.id not in awarded and predicate(user_progress)
+        ]
+        if earned:
+            earned = BadgeService._award_badges(user_progress, earned)
+        return earned
 
     @staticmethod
-    def _award_badge(user_progress, badge):
-        """Award badge to user"""
-        user_badge = UserBadge.objects.create(
-            user_progress=user_progress,
-            badge=badge
-        )
-        UserActivity.objects.create(
-            user=user_progress.user,
-            activity_type='badge',
-            description=f"Earned badge: {badge.name}",
-            metadata={'badge_id': badge.id}
-        )
+    def _award_badges(user_progress, badges):
+        """Award badges to user; returns the ones this call actually awarded"""
+        with transaction.atomic():
+            # Serialize concurrent checks for the user so each award is logged once
+            list(UserProgress.objects.select_for_update().filter(pk=user_progress.pk).values_list('pk'))
+            awarded = set(
+                UserBadge.objects.filter(user_progress=user_progress).values_list('badge_id', flat=True)
+            )
+            badges = [badge for badge in badges if badge.id not in awarded]
+            UserBadge.objects.bulk_create(
+                [UserBadge(user_progress=user_progress, badge=badge) for badge in badges],
+                ignore_conflicts=True
+            )
+        if not badges:
+            return badges
+        activity_ingestor.record_many([
+            {
+                'user_id': user_progress.user_id,
+                'activity_type': 'badge',
+                'description': f"Earned badge: {badge.name}",
+                'metadata': {'badge_id': badge.id},
+            }
+            for badge in badges
+        ])
+        return badges
 
 class TitleService:
     @staticmethod
@@ -54,23 +122,19 @@ class TitleService:
     @staticmethod
     def _check_title_criteria(user_progress, title):
         """Check if user meets title criteria"""
-        criteria = title.criteria
-        if criteria.get('type') == 'interview_score':
-            return user_progress.average_interview_score >= criteria.get('score', 0)
-        elif criteria.get('type') == 'training_hours':
-            return user_progress.total_training_hours >= criteria.get('hours', 0)
-        return False
+        predicate = compile_criteria(title.criteria, TITLE_CRITERIA_FIELDS)
+        return predicate is not None and predicate(user_progress)
 
     @staticmethod
     def _update_title(user_progress, title):
         """Update user's title"""
         user_progress.current_title = title
         user_progress.save()
-        UserActivity.objects.create(
-            user=user_progress.user,
-            activity_type='title',
-            description=f"Earned title: {title.name}",
-            metadata={'title_id': title.id}
+        activity_ingestor.record(
+            user_progress.user_id,
+            'title',
+            f"Earned title: {title.name}",
+            {'title_id': title.id}
         )
 
 class CSATService:
@@ -81,4 +145,215 @@ class CSATService:
             user_progress.last_csat_prompt = timezone.now()
             user_progress.save()
             return True
-        return False 
\ No newline at end of file
+        return False
+
+class ProgressAggregator:
+    """Applies O(1) atomic deltas to UserProgress counters as activity happens"""
+
+    @staticmethod
+    def get_progress(user_id):
+        """The user's progress row, created on first use.
+
+        UserProgress.user isn't unique, so concurrent first events could both create a
+        row; creation is serialized on the user's row instead.
+        """
+        progress = UserProgress.objects.filter(user_id=user_id).order_by('id').first()
+        if progress is not None:
+            return progress
+        with transaction.atomic():
+            list(get_user_model().objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+            progress = UserProgress.objects.filter(user_id=user_id).order_by('id').first()
+            if progress is None:
+                progress = UserProgress.objects.create(user_id=user_id)
+        return progress
+
+    @classmethod
+    def _apply(cls, user_id, **updates):
+        # update() skips auto_now; segment refreshes rely on updated_at to find changed users
+        if not UserProgress.objects.filter(user_id=user_id).update(updated_at=timezone.now(), **updates):
+            cls.get_progress(user_id)
+            UserProgress.objects.filter(user_id=user_id).update(updated_at=timezone.now(), **updates)
+
+    @staticmethod
+    def _streak_updates(activity_date):
+        """Extend, keep or restart the streak depending on the last active day"""
+        streak = Case(
+            When(last_active_on__gte=activity_date, then=F('current_streak_days')),
+            When(last_active_on=activity_date - timedelta(days=1), then=F('current_streak_days') + 1),
+            default=1
+        )
+        return {
+            'current_streak_days': streak,
+            'longest_streak_days': Greatest(F('longest_streak_days'), streak),
+            'last_active_on': Case(
+                When(last_active_on__gte=activity_date, then=F('last_active_on')),
+                default=activity_date
+            ),
+        }
+
+    @classmethod
+    def record_interview_completed(cls, interview):
+        activity_date = timezone.localdate(interview.completed_at or timezone.now())
+        cls._apply(
+            interview.user_id,
+            total_interviews=F('total_interviews') + 1,
+            **cls._streak_updates(activity_date)
+        )
+        cls._check_awards(interview.user_id)
+        cls._update_leaderboard(
+            interview.user_id, lambda boards: boards.record_active_day(interview.user_id, activity_date)
+        )
+
+    @classmethod
+    def record_assessment(cls, assessment, user_id):
+        # Both sides read the pre-update row, so this is the running mean over n + 1
+        cls._apply(
+            user_id,
+            average_interview_score=(
+                F('average_interview_score') * F('assessment_count') + assessment.overall_score
+            ) / (F('assessment_count') + 1.0),
+            assessment_count=F('assessment_count') + 1
+        )
+        cls._check_awards(user_id)
+        cls._update_leaderboard(
+            user_id, lambda boards: boards.record_assessment(user_id, assessment.overall_score, assessment.created_at)
+        )
+
+    @classmethod
+    def record_training_completed(cls, session):
+        end_time = session.end_time or timezone.now()
+        seconds = max(0, int((end_time - session.start_time).total_seconds()))
+        cls._apply(
+            session.user_id,
+            training_seconds=F('training_seconds') + seconds,
+            total_training_hours=(F('training_seconds') + seconds) / 3600,
+            **cls._streak_updates(timezone.localdate(end_time))
+        )
+        cls._check_awards(session.user_id)
+        cls._update_leaderboard(
+            session.user_id, lambda boards: boards.record_active_day(session.user_id, timezone.localdate(end_time))
+        )
+
+    @classmethod
+    def _check_awards(cls, user_id):
+        user_progress = (
+            UserProgress.objects.select_related('current_title').filter(user_id=user_id).order_by('id').first()
+        )
+        BadgeService.check_and_award_badges(user_progress)
+        TitleService.check_and_update_title(user_progress)
+        cls._update_leaderboard(user_id, lambda boards: boards.update(user_progress))
+
+    @staticmethod
+    def _update_leaderboard(user_id, write):
+        """Run a leaderboard write after commit; Redis sits outside the transaction, and a
+        slow or down Redis must not fail the write"""
+        def run():
+            try:
+                write(LeaderboardService())
+            except Exception as e:
+                logger.error(f"Error updating leaderboards for user {user_id}: {e}")
+
+        transaction.on_commit(run)
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+def _column(model, field):
+    return connection.ops.quote_name(model._meta.get_field(field).column)
+
+class RollupService:
+    """Folds new Interview/UserActivity rows into ActivityRollup past a per-source id watermark,
+    trailing the newest ids by ACTIVITY_ROLLUP_LAG_SECONDS"""
+
+    @staticmethod
+    def sources():
+        user = get_user_model()
+        tier = f"u.{_column(user, 'subscription_tier')}"
+        return {
+            'activity': {
+                'model': UserActivity,
+                'measure': None,
+                'dimensions': {'activity_type': f"src.{_column(UserActivity, 'activity_type')}", 'tier': tier},
+            },
+            'interview': {
+                'model': Interview,
+                'measure': f"src.{_column(Interview, 'duration_minutes')}",
+                'dimensions': {'interviewer_type': f"src.{_column(Interview, 'interviewer_type')}", 'tier': tier},
+            },
+        }
+
+    @classmethod
+    def refresh(cls) -> dict:
+        """Process rows added since the last run; returns how far each watermark advanced"""
+        lag = timedelta(seconds=getattr(settings, 'ACTIVITY_ROLLUP_LAG_SECONDS', 300))
+        processed = {}
+        for source, spec in cls.sources().items():
+            with transaction.atomic():
+                watermark, _ = RollupWatermark.objects.get_or_create(source=source)
+                watermark = RollupWatermark.objects.select_for_update().get(pk=watermark.pk)
+                now = timezone.now()
+                # Ids from transactions still in flight can commit below the current max id,
+                # so only fold up to a max id observed at least `lag` ago; anything that
+                # was in flight then has committed by now.
+                ripe = watermark.pending_at is not None and watermark.pending_at <= now - lag
+                if ripe or watermark.pending_at is None:
+                    high = watermark.pending_id if ripe else watermark.last_id
+                    watermark.pending_id = spec['model'].objects.aggregate(high=Max('id'))['high'] or 0
+                    watermark.pending_at = now
+                    watermark.save(update_fields=['pending_id', 'pending_at', 'updated_at'])
+                else:
+                    high = watermark.last_id
+                if high <= watermark.last_id:
+                    processed[source] = 0
+                    continue
+                with connection.cursor() as cursor:
+                    for dimension, expression in spec['dimensions'].items():
+                        for granularity in ('hour', 'day'):
+                            cursor.execute(
+                                cls._upsert_sql(spec, expression),
+                                {
+                                    'source': source,
+                                    'granularity': granularity,
+                                    'dimension': dimension,
+                                    'low': watermark.last_id,
+                                    'high': high,
+                                }
+                            )
+                processed[source] = high - watermark.last_id
+                watermark.last_id = high
+                watermark.save(update_fields=['last_id', 'updated_at'])
+        return processed
+
+    @staticmethod
+    def _upsert_sql(spec, expression):
+        model = spec['model']
+        user = get_user_model()
+        rollup = _table(ActivityRollup)
+        measure = f"COALESCE(SUM({spec['measure']}), 0)" if spec['measure'] else '0'
+        return f"""
+            INSERT INTO {rollup} (source, granularity, bucket_start, dimension, value, count, total)
+            SELECT %(source)s, %(granularity)s, date_trunc(%(granularity)s, src.{_column(model, 'created_at')}),
+                   %(dimension)s, COALESCE({expression}, ''), COUNT(*), {measure}
+            FROM {_table(model)} src
+            JOIN {_table(user)} u ON u.id = src.{_column(model, 'user')}
+            WHERE src.id > %(low)s AND src.id <= %(high)s
+            GROUP BY 3, 5
+            ON CONFLICT (source, granularity, bucket_start, dimension, value)
+            DO UPDATE SET count = {rollup}.count + EXCLUDED.count,
+                          total = {rollup}.total + EXCLUDED.total
+        """
+
+    @staticmethod
+    def query(source, dimension, granularity='day', start=None, end=None, value=None):
+        rollups = ActivityRollup.objects.filter(
+            source=source,
+            dimension=dimension,
+            granularity=granularity
+        )
+        if start:
+            rollups = rollups.filter(bucket_start__gte=start)
+        if end:
+            rollups = rollups.filter(bucket_start__lt=end)
+        if value:
+            rollups = rollups.filter(value=value)
+        return rollups.order_by('bucket_start', 'value')
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
+from django.dispatch import receiver
+from interviews.models import Interview, InterviewAssessment
+from training.models import TrainingSession
+from .models import Badge
+from .services import BadgeEngine, ProgressAggregator
+
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+def invalidate_badge_engine(sender, **kwargs):
+    """Recompile badge predicates after the catalog changes"""
+    # After commit, or another worker could recompile from the old rows under the new version
+    transaction.on_commit(BadgeEngine.invalidate)
+
+@receiver(post_init, sender=Interview)
+@receiver(post_init, sender=TrainingSession)
+def remember_completion_state(sender, instance, **kwargs):
+    """Note whether the row was loaded completed so post_save counts each completion once"""
+    # Taken from the loaded values, so ordinary saves cost no extra query
+    instance._was_completed = instance.__dict__.get('is_completed') if instance.pk else False
+
+@receiver(pre_save, sender=Interview)
+@receiver(pre_save, sender=TrainingSession)
+def look_up_deferred_completion_state(sender, instance, **kwargs):
+    if instance._was_completed is None:
+        # is_completed was deferred when the row was loaded
+        instance._was_completed = sender.objects.filter(pk=instance.pk, is_completed=True).exists()
+
+def newly_completed(instance, **kwargs) -> bool:
+    was_completed, instance._was_completed = instance._was_completed, instance.is_completed
+    return instance.is_completed and not was_completed and not kwargs.get('raw')
+
+@receiver(post_save, sender=Interview)
+def count_completed_interview(sender, instance, **kwargs):
+    if newly_completed(instance, **kwargs):
+        ProgressAggregator.record_interview_completed(instance)
+
+@receiver(post_save, sender=InterviewAssessment)
+def count_assessment(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        user_id = Interview.objects.filter(pk=instance.interview_id).values_list('user_id', flat=True).get()
+        ProgressAggregator.record_assessment(instance, user_id)
+
+@receiver(post_save, sender=TrainingSession)
+def count_completed_training(sender, instance, **kwargs):
+    if newly_completed(instance, **kwargs):
+        ProgressAggregator.record_training_completed(instance)
@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
     UserProgressView, UserActivityListView, UserActivityDetailView,
-    UserFeedbackListView, UserFeedbackDetailView
+    UserFeedbackListView, UserFeedbackDetailView, ActivityRollupView,
+    LeaderboardView
 )
 
 app_name = 'analytics'
@@ -17,4 +18,10 @@ urlpatterns = [
     # User Feedback URLs
     path('feedback/', UserFeedbackListView.as_view(), name='feedback-list'),
     path('feedback/<int:pk>/', UserFeedbackDetailView.as_view(), name='feedback-detail'),
+
+    # Leaderboards
+    path('leaderboards/<str:board>/', LeaderboardView.as_view(), name='leaderboard'),
+
+    # Dashboard rollups
+    path('rollups/', ActivityRollupView.as_view(), name='rollups'),
 ] 
\ No newline at end of file
@@ -1,11 +1,19 @@
+from datetime import datetime, time, timezone as dt_timezone
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from .models import UserProgress, UserActivity, UserFeedback
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .ingest import activity_ingestor
+from .models import UserProgress, UserActivity, UserActivityArchive, UserFeedback
 from .serializers import (
-    UserProgressSerializer, UserActivitySerializer,
-    UserFeedbackSerializer, UserFeedbackCreateSerializer
+    UserProgressSerializer, UserActivitySerializer, UserActivityArchiveSerializer,
+    UserFeedbackSerializer, UserFeedbackCreateSerializer, ActivityRollupSerializer
 )
+from .leaderboard import BOARDS, MAX_LIMIT, PERIODS, LeaderboardService
+from .services import ProgressAggregator, RollupService
 
 # Create your views here.
 
@@ -14,18 +22,51 @@ class UserProgressView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProgressSerializer
 
     def get_object(self):
-        obj, created = UserProgress.objects.get_or_create(user=self.request.user)
-        return obj
+        return ProgressAggregator.get_progress(self.request.user.id)
+
+class ActivityFeedPagination(CursorPagination):
+    """Keyset pagination over (created_at, id), served by the user feed indexes"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        # Once the hot table runs out, point the client at the start of the archive
+        if response.data['next'] is None and self.request.query_params.get('tier') != 'archive':
+            url = remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+            response.data['next'] = replace_query_param(url, 'tier', 'archive')
+        return response
 
 class UserActivityListView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = UserActivitySerializer
+    pagination_class = ActivityFeedPagination
+
+    def is_archive(self):
+        return self.request.method == 'GET' and self.request.query_params.get('tier') == 'archive'
+
+    def get_serializer_class(self):
+        if self.is_archive():
+            return UserActivityArchiveSerializer
+        return UserActivitySerializer
 
     def get_queryset(self):
+        if self.is_archive():
+            return UserActivityArchive.objects.filter(user=self.request.user)
         return UserActivity.objects.filter(user=self.request.user)
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+    def create(self, request, *args, **kwargs):
+        # Queued rather than inserted, so there is no id to return yet
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        activity_ingestor.record(
+            request.user.id,
+            serializer.validated_data['activity_type'],
+            serializer.validated_data['description'],
+            serializer.validated_data.get('metadata', {})
+        )
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 class UserActivityDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -54,3 +95,75 @@ class UserFeedbackDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         return UserFeedback.objects.filter(user=self.request.user)
+
+class LeaderboardView(generics.GenericAPIView):
+    """Top K plus the caller's rank and neighbours, e.g. /leaderboards/score/?period=week"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, board):
+        period = request.query_params.get('period', 'alltime')
+        if board not in BOARDS or period not in PERIODS:
+            return Response(
+                {'error': f"board must be one of {', '.join(BOARDS)} and period one of {', '.join(PERIODS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), MAX_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        service = LeaderboardService()
+        return Response({
+            'board': board,
+            'period': period,
+            'top': service.top(board, period, limit),
+            'me': service.rank(board, period, request.user.id),
+            'around_me': service.around(board, period, request.user.id),
+        })
+
+class ActivityRollupView(generics.ListAPIView):
+    """Pre-aggregated counts, e.g. ?source=interview&dimension=interviewer_type&granularity=day"""
+    permission_classes = [permissions.IsAdminUser]
+    serializer_class = ActivityRollupSerializer
+
+    def list(self, request, *args, **kwargs):
+        source = request.query_params.get('source', 'activity')
+        dimension = request.query_params.get('dimension')
+        granularity = request.query_params.get('granularity', 'day')
+        sources = RollupService.sources()
+        if source not in sources or dimension not in sources[source]['dimensions']:
+            return Response(
+                {'error': 'Unknown source or dimension',
+                 'available': {name: list(spec['dimensions']) for name, spec in sources.items()}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if granularity not in ('hour', 'day'):
+            return Response(
+                {'error': 'granularity must be hour or day'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start = parse_datetime_param(request.query_params.get('start'))
+            end = parse_datetime_param(request.query_params.get('end'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = RollupService.query(
+            source, dimension, granularity,
+            start=start, end=end, value=request.query_params.get('value')
+        )
+        return Response(self.get_serializer(rollups, many=True).data)
+
+def parse_datetime_param(value):
+    """Parse an ISO date or datetime query parameter, treating naive values as UTC"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
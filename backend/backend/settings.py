@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     
     # Third party apps
     'rest_framework',
+    'adrf',  # async APIView for the support chat path
     'corsheaders',
     'django_filters',
     'allauth',
@@ -56,6 +57,7 @@ INSTALLED_APPS = [
     'subscriptions',
     'analytics',
     'support',  # Added support app
+    'crm',
 ]
 
 MIDDLEWARE = [
@@ -66,6 +68,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'crm.middleware.AttributionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',  
@@ -208,6 +211,14 @@ HUBSPOT_API_KEY = os.getenv('HUBSPOT_API_KEY', '')
 
 # WebSocket Configuration
 ASGI_APPLICATION = 'core.asgi.application'
+# Shared across workers: badge, intent and FAQ caches invalidate through version keys here
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
@@ -237,4 +248,96 @@ INTERVIEW_CONFIG = {
         'male',
         'female'
     ]
-}
\ No newline at end of file
+}
+
+# Training lesson narration, pre-rendered by `manage.py render_lesson_audio`;
+# run it with --loop to pick up lessons whose content or questions changed
+TRAINING_AUDIO_CONFIG = {
+    'VOICE': 'Rachel',
+    'MODEL': 'eleven_monolingual_v1',
+    'STORAGE_PREFIX': 'lesson_audio',
+    'CONCURRENCY': int(os.getenv('TRAINING_AUDIO_CONCURRENCY', 4)),
+}
+
+# Volatile training session state (paused flag, current question, last activity).
+# Defaults to the channel-layer Redis; set BACKEND to 'memory' for tests.
+TRAINING_SESSION_STATE = {
+    'FLUSH_INTERVAL': 5,  # seconds between batched DB write-backs
+}
+
+# Activities older than this move to the archive table (`manage.py archive_activities`)
+ACTIVITY_ARCHIVE_AFTER_DAYS = int(os.getenv('ACTIVITY_ARCHIVE_AFTER_DAYS', 180))
+
+# `manage.py update_rollups` folds only ids it saw at least this long ago, so rows from
+# transactions that were still open get a chance to commit first
+ACTIVITY_ROLLUP_LAG_SECONDS = int(os.getenv('ACTIVITY_ROLLUP_LAG_SECONDS', 300))
+
+# Buffered UserActivity ingestion; failed flushes are spooled to SPOOL_PATH
+# and re-ingested with `manage.py replay_activity_spool`
+ACTIVITY_INGEST = {
+    'MAX_BATCH': 500,
+    'FLUSH_INTERVAL': 2.0,  # seconds
+    'SPOOL_PATH': os.path.join(BASE_DIR, 'var', 'activity_spool.jsonl'),
+}
+
+# Seconds between writes of in-memory score percentile histograms
+SCORE_HISTOGRAM_PERSIST_INTERVAL = 60
+
+# Leaderboards default to Redis sorted sets on the channel-layer Redis;
+# set BACKEND to 'memory' for tests. Rebuild with `manage.py rebuild_leaderboards`.
+LEADERBOARD = {
+    'KEY_PREFIX': 'leaderboard',
+}
+
+# HubSpot delivery; point BASE_URL at a local stub to test the outbox worker
+HUBSPOT_CONFIG = {
+    'BASE_URL': os.getenv('HUBSPOT_BASE_URL', 'https://api.hubapi.com'),
+    'TIMEOUT': 10,  # seconds
+    'MAX_ATTEMPTS': 8,
+}
+
+# Buffered UTM attribution writes from crm.middleware.AttributionMiddleware
+ATTRIBUTION_INGEST = {
+    'MAX_BATCH': 1000,
+    'FLUSH_INTERVAL': 5.0,  # seconds
+}
+
+# Lifecycle stage rules applied by `manage.py update_lifecycle_stages`
+CRM_LIFECYCLE = {
+    'CHURN_AFTER_DAYS': 30,
+    'ACTIVATION_INTERVIEWS': 1,
+}
+
+# Incremental segment refreshes run by `manage.py refresh_segments`
+CRM_SEGMENTS = {
+    'MAX_INCREMENTAL_USERS': 50000,  # more changed rows than this and the run refreshes in full
+}
+
+# In-process BM25 FAQ retrieval used by support chat before falling back to the LLM
+SUPPORT_FAQ_SEARCH = {
+    'DIRECT_ANSWER_RELEVANCE': 0.6,  # 0-1; answer straight from the FAQ at or above this
+    'GROUNDING_K': 3,  # FAQs passed to the LLM as grounding otherwise
+    'CATCH_UP_OVERLAP': 60,  # seconds re-read before a worker's last sync
+}
+
+# Timeouts (seconds) and pool size for the support chat's async HTTP client
+SUPPORT_HTTP = {
+    'CONNECT_TIMEOUT': 3.0,
+    'LLM_TIMEOUT': 20.0,
+    'HELPDESK_TIMEOUT': 10.0,
+    'MAX_CONNECTIONS': 100,
+}
+
+# Retry policy for `manage.py sync_helpdesk_tickets`
+HELPDESK_SYNC = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_BASE': 30,  # seconds
+}
+
+# Recent exchanges per support chat session, fed to intent detection as context
+SUPPORT_CHAT_HISTORY = {
+    'BACKEND': os.getenv('SUPPORT_CHAT_HISTORY_BACKEND', 'cache'),  # shared via CACHES; 'memory' is per process
+    'MAX_EXCHANGES': 5,
+    'TTL': 30 * 60,  # seconds
+}
@@ -29,6 +29,7 @@ urlpatterns = [
     path('api/subscriptions/', include('subscriptions.urls')),
     path('api/analytics/', include('analytics.urls')),
     path('api/support/', include('support.urls')),  # Added support URLs
+    path('api/crm/', include('crm.urls')),
 ]
 
 # Serve media files in development
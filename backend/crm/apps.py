@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
+
+
+class CrmConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'crm'
+
+    def ready(self):
+        from . import signals
+        pre_migrate.connect(signals.close_duplicate_lifecycle_stages, sender=self)
@@ -0,0 +1,132 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Dict, Optional
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import AdAttribution, CampaignConversionRollup
+
+logger = logging.getLogger(__name__)
+
+UTM_FIELDS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content']
+TOUCH_FIELDS = UTM_FIELDS + ['referrer', 'landing_page']
+CAMPAIGN_FIELDS = ['utm_source', 'utm_medium', 'utm_campaign']
+CLICK_ID_FIELDS = ['gclid', 'fbclid', 'msclkid']  # ad clicks that arrive without UTM tags
+
+def get_attribution_config() -> Dict[str, Any]:
+    """Return the attribution ingest settings merged over their defaults"""
+    config = {
+        'ENABLED': True,  # False writes each touch synchronously (useful in tests)
+        'MAX_BATCH': 1000,
+        'FLUSH_INTERVAL': 5.0,  # seconds
+    }
+    config.update(getattr(settings, 'ATTRIBUTION_INGEST', {}))
+    return config
+
+def clean_touch(touch: Dict[str, Any]) -> Dict[str, Any]:
+    """Trim a touch to the AdAttribution columns and their lengths"""
+    cleaned = {field: (touch.get(field) or '')[:100] for field in UTM_FIELDS}
+    cleaned['referrer'] = (touch.get('referrer') or '')[:200]
+    cleaned['landing_page'] = (touch.get('landing_page') or '')[:200]
+    return cleaned
+
+class AttributionBuffer:
+    """Collapses touches in process and upserts first/last touch rows in bulk"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or get_attribution_config()
+        self._first: Dict[int, Dict[str, Any]] = {}
+        self._last: Dict[int, Dict[str, Any]] = {}
+        self._visits = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        atexit.register(self.flush)
+
+    def record_visit(self, touch: Dict[str, Any]):
+        """Count a campaign visit, whether or not the visitor is signed in"""
+        key = (timezone.localdate(),) + tuple((touch.get(field) or '')[:100] for field in CAMPAIGN_FIELDS)
+        with self._lock:
+            self._visits[key] += 1
+        self._queued()
+
+    def record_touch(self, user_id: int, touch: Dict[str, Any], first: Optional[Dict[str, Any]] = None):
+        """Queue a user's latest touch, and their first touch if it predates sign-in"""
+        with self._lock:
+            # The earliest touch in the buffer wins first-touch; the database keeps an older one
+            self._first.setdefault(user_id, clean_touch(first or touch))
+            self._last[user_id] = clean_touch(touch)
+        self._queued()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of users handled"""
+        with self._flush_lock:
+            with self._lock:
+                first, self._first = self._first, {}
+                last, self._last = self._last, {}
+                visits, self._visits = self._visits, Counter()
+            if not (first or last or visits):
+                return 0
+            try:
+                self._write(first, last, visits)
+            except Exception as e:
+                # Attribution is best effort; losing a batch must not take down requests
+                logger.error(f"Error writing attribution for {len(last)} users: {e}")
+            return len(last)
+
+    def _write(self, first, last, visits):
+        with transaction.atomic():
+            AdAttribution.objects.bulk_create(
+                [AdAttribution(user_id=user_id, touch='first', **touch) for user_id, touch in first.items()],
+                batch_size=self.config['MAX_BATCH'],
+                ignore_conflicts=True
+            )
+            AdAttribution.objects.bulk_create(
+                [AdAttribution(user_id=user_id, touch='last', **touch) for user_id, touch in last.items()],
+                batch_size=self.config['MAX_BATCH'],
+                update_conflicts=True,
+                unique_fields=['user', 'touch'],
+                update_fields=TOUCH_FIELDS + ['last_visit']
+            )
+            for (day, *campaign), count in visits.items():
+                increment_rollup(day, 'visit', dict(zip(CAMPAIGN_FIELDS, campaign)), visits=count)
+
+    def _queued(self):
+        if not self.config['ENABLED']:
+            self.flush()
+            return
+        with self._lock:
+            full = len(self._last) + len(self._visits) >= self.config['MAX_BATCH']
+        self._ensure_worker()
+        if full:
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='attribution-ingest', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.config['FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+def increment_rollup(day, touch: str, campaign: Dict[str, str], visits: int = 0,
+                     conversions: int = 0, value: Decimal = Decimal('0')):
+    rollup, _ = CampaignConversionRollup.objects.get_or_create(day=day, touch=touch, **campaign)
+    CampaignConversionRollup.objects.filter(pk=rollup.pk).update(
+        visits=F('visits') + visits,
+        conversions=F('conversions') + conversions,
+        conversion_value=F('conversion_value') + value
+    )
+
+attribution_buffer = AttributionBuffer()
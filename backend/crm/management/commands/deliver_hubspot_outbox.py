@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from crm.services import HubSpotOutboxWorker
+
+class Command(BaseCommand):
+    help = 'Deliver queued HubSpot events in batches, retrying with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when drained')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        worker = HubSpotOutboxWorker()
+        while True:
+            stats = worker.drain()
+            if any(stats.values()):
+                self.stdout.write(
+                    f"Delivered {stats['delivered']}, retrying {stats['retrying']}, dead {stats['dead']}"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from crm.models import UserSegment
+from crm.services import SegmentCriteriaError, SegmentEngine
+
+class Command(BaseCommand):
+    help = 'Recompute UserSegment memberships, incrementally for users whose inputs changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segment', type=int, action='append', help='Only refresh these segment ids')
+        parser.add_argument('--full', action='store_true', help='Re-evaluate every user')
+
+    def handle(self, *args, **options):
+        segments = UserSegment.objects.all()
+        if options['segment']:
+            segments = segments.filter(id__in=options['segment'])
+        segments = list(segments)
+
+        # One scan of the change sources for every segment in this run
+        run_started = timezone.now()
+        full = options['full']
+        changes = None
+        if not full:
+            changes = SegmentEngine.pending_changes(segments)
+            if changes is None:
+                self.stdout.write('Too many users changed since the last run; refreshing every segment in full')
+                full = True
+
+        for segment in segments:
+            started = time.monotonic()
+            try:
+                result = SegmentEngine.refresh(segment, full=full, changes=changes, started=run_started)
+            except SegmentCriteriaError as e:
+                self.stderr.write(f"{segment}: {e}")
+                continue
+            self.stdout.write(
+                f"{segment}: {result['joined']} joined, {result['left']} left, "
+                f"{result['evaluated']} evaluated in {time.monotonic() - started:.1f}s"
+            )
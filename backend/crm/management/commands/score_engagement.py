@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from crm.services import EngagementScoringService
+
+class Command(BaseCommand):
+    help = 'Recompute UserEngagementScore for every user in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        scored = EngagementScoringService.score_all(
+            chunk_size=options['chunk_size'],
+            progress=lambda count: self.stdout.write(f"\rScored {count} users", ending='')
+        )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} users in {time.monotonic() - started:.1f}s"
+        ))
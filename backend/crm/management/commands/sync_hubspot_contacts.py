@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from crm.services import HubSpotContactSyncService
+
+class Command(BaseCommand):
+    help = 'Push changed user properties to HubSpot contacts via batch upserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users read per query')
+        parser.add_argument('--full', action='store_true', help='Resend every contact, ignoring stored hashes')
+        parser.add_argument('--dry-run', action='store_true', help='Count changed contacts without sending')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = HubSpotContactSyncService().sync_all(
+            batch_size=options['batch_size'],
+            full=options['full'],
+            dry_run=options['dry_run']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {stats['checked']} users in {time.monotonic() - started:.1f}s: "
+            f"{stats['changed']} {'would be ' if options['dry_run'] else ''}synced, {stats['failed']} failed"
+        ))
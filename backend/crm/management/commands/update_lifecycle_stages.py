@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from crm.services import LifecycleEngine
+
+class Command(BaseCommand):
+    help = 'Apply lifecycle rules (trial, active, churned, reactivated) to all users in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Count transitions without writing')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        moved = LifecycleEngine.run(dry_run=options['dry_run'])
+        for transition, count in moved.items():
+            self.stdout.write(f"{transition}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(moved.values())} users {'would move' if options['dry_run'] else 'moved'} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,77 @@
+import json
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .attribution import CLICK_ID_FIELDS, UTM_FIELDS, attribution_buffer, clean_touch
+
+COOKIE_NAME = 'attribution'
+COOKIE_SALT = 'crm.attribution'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30  # seconds
+
+class AttributionMiddleware:
+    """Captures UTM, referrer and landing page on campaign visits without touching the database"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method == 'GET':
+            try:
+                self.capture(request, response)
+            except Exception:
+                pass  # Attribution must never break a page view
+        return response
+
+    def capture(self, request, response):
+        touch = self.touch(request)
+        user = self.user(request)
+        signed_in = user is not None and user.is_authenticated
+        stored = request.get_signed_cookie(COOKIE_NAME, default=None, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE)
+        stored = json.loads(stored) if stored else {}
+
+        if touch:
+            attribution_buffer.record_visit(touch)
+            if not signed_in:
+                # Held in a signed cookie (no session write) until sign-up or login ties it to a user
+                touch = clean_touch(touch)
+                stored.setdefault('first', touch)
+                stored['last'] = touch
+                response.set_signed_cookie(
+                    COOKIE_NAME, json.dumps(stored), salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE,
+                    secure=request.is_secure(), httponly=True, samesite='Lax'
+                )
+                return
+
+        if signed_in:
+            if stored:
+                response.delete_cookie(COOKIE_NAME, samesite='Lax')
+            last = touch or stored.get('last')
+            if last:
+                attribution_buffer.record_touch(user.id, last, first=stored.get('first'))
+
+    @staticmethod
+    def user(request):
+        """The signed-in user, from the session or from the API client's bearer token.
+
+        DRF authenticates JWT requests inside the view, so Django's request.user
+        stays anonymous for them here.
+        """
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user
+        if not request.META.get('HTTP_AUTHORIZATION'):
+            return user
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except Exception:
+            return user  # Invalid or expired token; the view reports it
+        return authenticated[0] if authenticated else user
+
+    @staticmethod
+    def touch(request):
+        """Return the visit's attribution data, or None unless it carries UTM parameters or an ad click ID"""
+        if not any(request.GET.get(field) for field in UTM_FIELDS + CLICK_ID_FIELDS):
+            return None
+        touch = {field: request.GET.get(field, '') for field in UTM_FIELDS}
+        touch['referrer'] = request.META.get('HTTP_REFERER', '')
+        touch['landing_page'] = request.build_absolute_uri()
+        return touch
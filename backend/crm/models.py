@@ -8,6 +8,7 @@ class UserSegment(models.Model):
     criteria = models.JSONField()  # Store segment criteria as JSON
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    last_computed_at = models.DateTimeField(null=True, blank=True)  # Membership current as of this time
 
     def __str__(self):
         return self.name
@@ -20,12 +21,21 @@ class UserSegmentMembership(models.Model):
 
     class Meta:
         unique_together = ('user', 'segment')
+        indexes = [
+            models.Index(fields=['segment', 'left_at'], name='segment_membership_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.segment.name}"
 
 class AdAttribution(models.Model):
+    TOUCH_CHOICES = [
+        ('first', 'First Touch'),
+        ('last', 'Last Touch'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    touch = models.CharField(max_length=10, choices=TOUCH_CHOICES, default='last')
     utm_source = models.CharField(max_length=100, blank=True)
     utm_medium = models.CharField(max_length=100, blank=True)
     utm_campaign = models.CharField(max_length=100, blank=True)
@@ -38,8 +48,41 @@ class AdAttribution(models.Model):
     conversion_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     conversion_date = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'touch'], name='unique_attribution_touch'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.utm_source} ({self.touch})"
+
+class CampaignConversionRollup(models.Model):
+    """Daily visits and credited conversions per campaign, maintained as they are recorded"""
+    TOUCH_CHOICES = [
+        ('visit', 'Visit'),
+        ('first', 'First Touch'),
+        ('last', 'Last Touch'),
+    ]
+
+    day = models.DateField()
+    touch = models.CharField(max_length=10, choices=TOUCH_CHOICES)  # visit rows count traffic only
+    utm_source = models.CharField(max_length=100, blank=True)
+    utm_medium = models.CharField(max_length=100, blank=True)
+    utm_campaign = models.CharField(max_length=100, blank=True)
+    visits = models.BigIntegerField(default=0)
+    conversions = models.BigIntegerField(default=0)
+    conversion_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'touch', 'utm_source', 'utm_medium', 'utm_campaign'],
+                name='unique_campaign_rollup_bucket'
+            )
+        ]
+
     def __str__(self):
-        return f"{self.user.email} - {self.utm_source}"
+        return f"{self.day} {self.touch} {self.utm_source}/{self.utm_medium}/{self.utm_campaign}"
 
 class UserLifecycleStage(models.Model):
     STAGE_CHOICES = [
@@ -56,13 +99,30 @@ class UserLifecycleStage(models.Model):
     left_at = models.DateTimeField(null=True, blank=True)
     reason = models.TextField(blank=True)
 
+    class Meta:
+        constraints = [
+            # One open stage per user; doubles as the index behind current-stage lookups
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(left_at__isnull=True),
+                name='unique_current_lifecycle_stage'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['stage', 'user'],
+                condition=models.Q(left_at__isnull=True),
+                name='lifecycle_current_stage_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.stage}"
 
 class UserEngagementScore(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     score = models.IntegerField(default=0)
-    last_calculated = models.DateTimeField(auto_now=True)
+    last_calculated = models.DateTimeField(auto_now=True, db_index=True)
     factors = models.JSONField()  # Store engagement factors and weights
 
     def __str__(self):
@@ -70,38 +130,45 @@ class UserEngagementScore(models.Model):
 
     def calculate_score(self):
         """Calculate user engagement score based on various factors"""
-        from analytics.models import UserProgress, UserActivity
-        
-        progress = UserProgress.objects.get(user=self.user)
-        activities = UserActivity.objects.filter(user=self.user)
-        
-        score = 0
-        factors = {}
-        
-        # Interview activity
-        interview_count = progress.total_interviews
-        factors['interview_count'] = interview_count
-        score += interview_count * 10
-        
-        # Training activity
-        training_hours = progress.total_training_hours
-        factors['training_hours'] = training_hours
-        score += training_hours * 5
-        
-        # Recent activity
-        recent_activities = activities.filter(
-            created_at__gte=timezone.now() - timezone.timedelta(days=30)
-        ).count()
-        factors['recent_activities'] = recent_activities
-        score += recent_activities * 2
-        
-        # Streak bonus
-        if progress.current_streak_days > 0:
-            factors['streak_days'] = progress.current_streak_days
-            score += progress.current_streak_days * 3
-        
-        self.score = score
-        self.factors = factors
-        self.save()
-        
-        return score 
\ No newline at end of file
+        from .services import EngagementScoringService
+
+        EngagementScoringService.score_users([self.user_id])
+        self.refresh_from_db()
+        return self.score
+
+class HubSpotOutbox(models.Model):
+    """HubSpot events waiting for delivery by `manage.py deliver_hubspot_outbox`"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('dead', 'Dead Letter'),
+    ]
+
+    event_name = models.CharField(max_length=100)
+    email = models.EmailField()
+    properties = models.JSONField(default=dict)
+    occurred_at = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='hubspot_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_name} for {self.email} ({self.status})"
+
+class HubSpotContactSync(models.Model):
+    """Last property set pushed to HubSpot for a user, so unchanged contacts are skipped"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hubspot_sync')
+    properties_hash = models.CharField(max_length=64)
+    properties = models.JSONField(default=dict)
+    synced_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"HubSpot sync for {self.user_id} at {self.synced_at}"
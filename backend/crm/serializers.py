@@ -0,0 +1,28 @@
+from rest_framework import serializers
+from .models import UserSegment, UserSegmentMembership, UserLifecycleStage, UserEngagementScore
+
+class UserSegmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserSegment
+        fields = ['id', 'name', 'description', 'criteria', 'created_at', 'updated_at', 'last_computed_at']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'last_computed_at']
+
+class UserSegmentMembershipSerializer(serializers.ModelSerializer):
+    segment_name = serializers.CharField(source='segment.name', read_only=True)
+
+    class Meta:
+        model = UserSegmentMembership
+        fields = ['id', 'segment', 'segment_name', 'joined_at', 'left_at']
+        read_only_fields = ['id', 'segment_name', 'joined_at', 'left_at']
+
+class UserLifecycleStageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserLifecycleStage
+        fields = ['id', 'user', 'stage', 'entered_at', 'left_at', 'reason']
+        read_only_fields = ['id', 'user', 'entered_at', 'left_at']
+
+class UserEngagementScoreSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserEngagementScore
+        fields = ['score', 'factors', 'last_calculated']
+        read_only_fields = fields
@@ -1,17 +1,71 @@
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+import hashlib
+import json
+import logging
+import numpy as np
+import random
 import requests
-from typing import Dict, Any
-from datetime import datetime
+import time
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+def get_hubspot_config() -> Dict[str, Any]:
+    """Return the HubSpot delivery settings merged over their defaults"""
+    config = {
+        'BASE_URL': 'https://api.hubapi.com',
+        'TIMEOUT': 10,  # seconds
+        'BATCH_SIZE': 500,
+        'MAX_ATTEMPTS': 8,
+        'BACKOFF_BASE': 30,  # seconds; doubles on every failed attempt
+        'LEASE': 120,  # seconds a worker owns a claimed batch
+        'UPSERT_CHUNK': 100,  # HubSpot's batch upsert limit
+        'REQUESTS_PER_SECOND': 9,  # stays under the 100 requests / 10s app limit
+    }
+    config.update(getattr(settings, 'HUBSPOT_CONFIG', {}))
+    return config
 
 class HubSpotService:
     BASE_URL = 'https://api.hubapi.com'
     
     def __init__(self):
+        self.config = get_hubspot_config()
+        self.BASE_URL = self.config['BASE_URL']
         self.api_key = settings.HUBSPOT_API_KEY
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
+        self._session = None
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled keep-alive session shared by all calls on this service"""
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
+        return self._session
+
+    @staticmethod
+    def enqueue_event(event_name: str, email: str, properties: Dict[str, Any] = None):
+        """Record an event for asynchronous delivery; call inside the caller's transaction"""
+        from .models import HubSpotOutbox
+
+        return HubSpotOutbox.objects.create(
+            event_name=event_name,
+            email=email,
+            properties=properties or {}
+        )
 
     def create_or_update_contact(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create or update a contact in HubSpot"""
@@ -25,7 +79,7 @@ class HubSpotService:
             'phone': user_data.get('phone_number'),
             'linkedin': user_data.get('linkedin_url'),
             'subscription_tier': user_data.get('subscription_tier'),
-            'last_login_date': datetime.now().isoformat(),
+            'last_login_date': user_data.get('last_login_date'),
             'total_interviews': str(user_data.get('total_interviews', 0)),
             'total_training_hours': str(user_data.get('total_training_hours', 0))
         }
@@ -67,6 +121,252 @@ class HubSpotService:
         response.raise_for_status()
         return response.json()
 
+class HubSpotContactSyncService:
+    """Pushes only changed contact properties to HubSpot through batch upserts"""
+
+    def __init__(self, service: HubSpotService = None):
+        self.service = service or HubSpotService()
+        self.config = self.service.config
+        self._last_request = 0.0
+
+    @staticmethod
+    def contact_properties(user: Dict[str, Any], progress: Dict[str, Any]) -> Dict[str, str]:
+        """Map a user to HubSpot properties; values are strings so hashes stay stable"""
+        last_login = user.get('last_login')
+        properties = {
+            'email': user['email'],
+            'firstname': user.get('first_name') or '',
+            'lastname': user.get('last_name') or '',
+            'phone': user.get('phone_number') or '',
+            'linkedin': user.get('linkedin_url') or '',
+            'subscription_tier': user.get('subscription_tier') or '',
+            # Date only: a login later the same day is not a change worth syncing
+            'last_login_date': last_login.date().isoformat() if last_login else '',
+            'total_interviews': str(progress.get('total_interviews', 0)),
+            'total_training_hours': str(progress.get('total_training_hours', 0)),
+        }
+        return properties
+
+    @staticmethod
+    def properties_hash(properties: Dict[str, str]) -> str:
+        return hashlib.sha256(json.dumps(properties, sort_keys=True).encode()).hexdigest()
+
+    def sync_all(self, batch_size: int = 1000, full: bool = False, dry_run: bool = False) -> Dict[str, int]:
+        """Walk all users by id and upsert the contacts whose properties changed"""
+        User = get_user_model()
+        stats = {'checked': 0, 'changed': 0, 'failed': 0}
+        last_id = 0
+        while True:
+            users = list(
+                User.objects.filter(id__gt=last_id, is_active=True).order_by('id').values(
+                    'id', 'email', 'first_name', 'last_name', 'phone_number',
+                    'linkedin_url', 'subscription_tier', 'last_login'
+                )[:batch_size]
+            )
+            if not users:
+                break
+            last_id = users[-1]['id']
+            for key, count in self.sync_users(users, full, dry_run).items():
+                stats[key] += count
+        return stats
+
+    def sync_users(self, users: List[Dict[str, Any]], full: bool = False, dry_run: bool = False) -> Dict[str, int]:
+        from analytics.models import UserProgress
+        from .models import HubSpotContactSync
+
+        user_ids = [user['id'] for user in users]
+        progress = {
+            row['user_id']: row
+            for row in UserProgress.objects.filter(user_id__in=user_ids).values(
+                'user_id', 'total_interviews', 'total_training_hours'
+            )
+        }
+        synced = {
+            row.user_id: row for row in HubSpotContactSync.objects.filter(user_id__in=user_ids)
+        }
+
+        pending = []
+        for user in users:
+            properties = self.contact_properties(user, progress.get(user['id'], {}))
+            digest = self.properties_hash(properties)
+            previous = synced.get(user['id'])
+            if previous and previous.properties_hash == digest and not full:
+                continue
+            if previous and not full:
+                # Email is the upsert key, so it is always sent
+                changed = {
+                    name: value for name, value in properties.items()
+                    if name == 'email' or previous.properties.get(name) != value
+                }
+            else:
+                changed = properties
+            pending.append((user, properties, digest, changed))
+
+        stats = {'checked': len(users), 'changed': len(pending), 'failed': 0}
+        if dry_run:
+            return stats
+
+        chunk = self.config['UPSERT_CHUNK']
+        for start in range(0, len(pending), chunk):
+            rows = pending[start:start + chunk]
+            if not self.upsert([changed for _, _, _, changed in rows]):
+                stats['failed'] += len(rows)
+                continue
+            now = timezone.now()
+            HubSpotContactSync.objects.bulk_create(
+                [
+                    HubSpotContactSync(
+                        user_id=user['id'], properties_hash=digest,
+                        properties=properties, synced_at=now
+                    )
+                    for user, properties, digest, _ in rows
+                ],
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['properties_hash', 'properties', 'synced_at']
+            )
+        return stats
+
+    def upsert(self, contacts: List[Dict[str, str]]) -> bool:
+        """Batch upsert keyed by email, honouring the rate limit and 429 Retry-After"""
+        payload = {
+            'inputs': [
+                {'idProperty': 'email', 'id': contact['email'], 'properties': contact}
+                for contact in contacts
+            ]
+        }
+        for attempt in range(self.config['MAX_ATTEMPTS']):
+            self._throttle()
+            try:
+                response = self.service.session.post(
+                    f"{self.service.BASE_URL}/crm/v3/objects/contacts/batch/upsert",
+                    json=payload,
+                    timeout=self.config['TIMEOUT']
+                )
+            except requests.RequestException as e:
+                logger.warning(f"HubSpot contact upsert failed: {e}")
+                time.sleep(min(60, 2 ** attempt))
+                continue
+            if response.status_code < 300:
+                return True
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = response.headers.get('Retry-After')
+                time.sleep(float(retry_after) if retry_after else min(60, 2 ** attempt))
+                continue
+            logger.error(f"HubSpot rejected contact upsert: HTTP {response.status_code}: {response.text[:500]}")
+            return False
+        return False
+
+    def _throttle(self):
+        interval = 1.0 / self.config['REQUESTS_PER_SECOND']
+        wait = self._last_request + interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+
+class HubSpotOutboxWorker:
+    """Drains HubSpotOutbox in batches with backoff and dead-lettering"""
+
+    def __init__(self, service: HubSpotService = None):
+        self.service = service or HubSpotService()
+        self.config = self.service.config
+
+    def drain(self, max_batches: int = None) -> Dict[str, int]:
+        stats = {'delivered': 0, 'retrying': 0, 'dead': 0}
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            rows = self.claim()
+            if not rows:
+                break
+            batches += 1
+            for key, count in self.deliver(rows).items():
+                stats[key] += count
+        return stats
+
+    def claim(self) -> list:
+        """Lease a batch of due rows so concurrent workers never send the same events"""
+        from .models import HubSpotOutbox
+
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                HubSpotOutbox.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:self.config['BATCH_SIZE']]
+            )
+            if rows:
+                self.renew(rows)
+        return rows
+
+    def renew(self, rows) -> None:
+        """Push the lease on rows still owned by this worker out by another LEASE"""
+        from .models import HubSpotOutbox
+
+        HubSpotOutbox.objects.filter(id__in=[row.id for row in rows], status='pending').update(
+            next_attempt_at=timezone.now() + timedelta(seconds=self.config['LEASE'])
+        )
+
+    def deliver(self, rows) -> Dict[str, int]:
+        try:
+            response = self.service.session.post(
+                f"{self.service.BASE_URL}/events/v3/send/batch",
+                json={'inputs': [self.payload(row) for row in rows]},
+                timeout=self.config['TIMEOUT']
+            )
+        except requests.RequestException as e:
+            return self.fail(rows, str(e), permanent=False)
+
+        if response.status_code < 300:
+            return self.succeed(rows)
+        if response.status_code in (400, 422) and len(rows) > 1:
+            # One malformed event rejects the whole batch; isolate it. Sending rows one
+            # by one can outlast the lease, so renew it for the rows not yet sent.
+            stats = {'delivered': 0, 'retrying': 0, 'dead': 0}
+            for i, row in enumerate(rows):
+                self.renew(rows[i:])
+                for key, count in self.deliver([row]).items():
+                    stats[key] += count
+            return stats
+        permanent = 400 <= response.status_code < 500 and response.status_code != 429
+        return self.fail(rows, f"HTTP {response.status_code}: {response.text[:500]}", permanent)
+
+    @staticmethod
+    def payload(row) -> Dict[str, Any]:
+        return {
+            'email': row.email,
+            'eventName': row.event_name,
+            'properties': row.properties,
+            'occurredAt': row.occurred_at.isoformat(),
+        }
+
+    def succeed(self, rows) -> Dict[str, int]:
+        from .models import HubSpotOutbox
+
+        HubSpotOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+            status='delivered',
+            delivered_at=timezone.now(),
+            last_error=''
+        )
+        return {'delivered': len(rows), 'retrying': 0, 'dead': 0}
+
+    def fail(self, rows, error: str, permanent: bool) -> Dict[str, int]:
+        now = timezone.now()
+        for row in rows:
+            row.attempts += 1
+            row.last_error = error
+            if permanent or row.attempts >= self.config['MAX_ATTEMPTS']:
+                row.status = 'dead'
+            else:
+                delay = self.config['BACKOFF_BASE'] * 2 ** (row.attempts - 1)
+                row.next_attempt_at = now + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        from .models import HubSpotOutbox
+
+        HubSpotOutbox.objects.bulk_update(rows, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+        dead = sum(1 for row in rows if row.status == 'dead')
+        if dead:
+            logger.error(f"Dead-lettered {dead} HubSpot events: {error}")
+        return {'delivered': 0, 'retrying': len(rows) - dead, 'dead': dead}
+
 class AdAttributionService:
     def __init__(self):
         self.facebook_pixel_id = settings.FACEBOOK_PIXEL_ID
@@ -99,4 +399,447 @@ class AdAttributionService:
             value = request.GET.get(f'utm_{param}')
             if value:
                 utm_params[f'utm_{param}'] = value
-        return utm_params 
\ No newline at end of file
+        return utm_params
+
+    @staticmethod
+    def get_attribution(user) -> Dict[str, Any]:
+        """Stored first- and last-touch attribution for a user"""
+        from .attribution import TOUCH_FIELDS
+        from .models import AdAttribution
+
+        touches = AdAttribution.objects.filter(user=user).values(
+            'touch', 'first_visit', 'last_visit', 'conversion_value', 'conversion_date', *TOUCH_FIELDS
+        )
+        return {touch.pop('touch'): touch for touch in touches}
+
+    @staticmethod
+    def record_conversion(user, value=None) -> None:
+        """Credit a conversion to the user's first and last touch, and to their campaigns' rollups"""
+        from django.db.models import F
+        from django.db.models.functions import Coalesce
+        from .attribution import CAMPAIGN_FIELDS, increment_rollup
+        from .models import AdAttribution
+
+        amount = Decimal(str(value or 0))
+        now = timezone.now()
+        with transaction.atomic():
+            touches = list(
+                AdAttribution.objects.select_for_update().filter(user=user).values('id', 'touch', *CAMPAIGN_FIELDS)
+            )
+            if not touches:
+                return
+            AdAttribution.objects.filter(id__in=[touch['id'] for touch in touches]).update(
+                conversion_value=Coalesce(F('conversion_value'), Decimal('0')) + amount,
+                conversion_date=now
+            )
+            for touch in touches:
+                increment_rollup(
+                    timezone.localdate(now),
+                    touch['touch'],
+                    {field: touch[field] for field in CAMPAIGN_FIELDS},
+                    conversions=1,
+                    value=amount
+                )
+
+    @staticmethod
+    def campaign_report(start=None, end=None, touch: str = 'last') -> List[Dict[str, Any]]:
+        """Visits, conversions and value per campaign from the daily rollups"""
+        from django.db.models import Sum
+        from .attribution import CAMPAIGN_FIELDS
+        from .models import CampaignConversionRollup
+
+        rollups = CampaignConversionRollup.objects.filter(touch__in=['visit', touch])
+        if start:
+            rollups = rollups.filter(day__gte=start)
+        if end:
+            rollups = rollups.filter(day__lt=end)
+
+        report = {}
+        for row in rollups.values('touch', *CAMPAIGN_FIELDS).annotate(
+            visits=Sum('visits'), conversions=Sum('conversions'), value=Sum('conversion_value')
+        ):
+            key = tuple(row[field] for field in CAMPAIGN_FIELDS)
+            entry = report.setdefault(key, {
+                **dict(zip(CAMPAIGN_FIELDS, key)),
+                'visits': 0, 'conversions': 0, 'conversion_value': Decimal('0'),
+            })
+            entry['visits'] += row['visits']
+            entry['conversions'] += row['conversions']
+            entry['conversion_value'] += row['value']
+        for entry in report.values():
+            entry['conversion_rate'] = entry['conversions'] / entry['visits'] if entry['visits'] else None
+        return sorted(report.values(), key=lambda entry: entry['conversion_value'], reverse=True)
+
+class EngagementScoringService:
+    """Scores users in bulk: a few grouped queries per chunk and one NumPy dot product"""
+    FACTORS = ['interview_count', 'training_hours', 'recent_activities', 'streak_days']
+    WEIGHTS = np.array([10, 5, 2, 3])
+    RECENT_DAYS = 30
+
+    @classmethod
+    def score_all(cls, chunk_size: int = 5000, progress=None) -> int:
+        """Rescore every user, walking user ids in chunks"""
+        user_ids = get_user_model().objects.order_by('id').values_list('id', flat=True)
+        scored = 0
+        last_id = 0
+        while True:
+            chunk = list(user_ids.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                return scored
+            scored += cls.score_users(chunk)
+            last_id = chunk[-1]
+            if progress:
+                progress(scored)
+
+    @classmethod
+    def score_users(cls, user_ids: List[int]) -> int:
+        from analytics.models import UserProgress, UserActivity
+        from .models import UserEngagementScore
+
+        index = {user_id: position for position, user_id in enumerate(user_ids)}
+        matrix = np.zeros((len(user_ids), len(cls.FACTORS)), dtype=np.int64)
+
+        for user_id, interviews, hours, streak in UserProgress.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'total_interviews', 'total_training_hours', 'current_streak_days'):
+            matrix[index[user_id], [0, 1, 3]] = (interviews, hours, max(streak, 0))
+
+        for user_id, recent in UserActivity.objects.filter(
+            user_id__in=user_ids,
+            created_at__gte=timezone.now() - timedelta(days=cls.RECENT_DAYS)
+        ).values('user_id').annotate(n=Count('id')).values_list('user_id', 'n'):
+            matrix[index[user_id], 2] = recent
+
+        scores = matrix @ cls.WEIGHTS
+        now = timezone.now()
+
+        existing = {
+            score.user_id: score
+            for score in UserEngagementScore.objects.filter(user_id__in=user_ids)
+        }
+        to_create, to_update = [], []
+        for user_id, position in index.items():
+            row = matrix[position]
+            factors = {name: int(value) for name, value in zip(cls.FACTORS[:3], row[:3])}
+            if row[3] > 0:
+                factors['streak_days'] = int(row[3])
+            score = existing.get(user_id)
+            if score is None:
+                to_create.append(UserEngagementScore(
+                    user_id=user_id, score=int(scores[position]), factors=factors, last_calculated=now
+                ))
+            else:
+                score.score = int(scores[position])
+                score.factors = factors
+                score.last_calculated = now
+                to_update.append(score)
+
+        with transaction.atomic():
+            UserEngagementScore.objects.bulk_create(to_create)
+            UserEngagementScore.objects.bulk_update(to_update, ['score', 'factors', 'last_calculated'])
+        return len(user_ids)
+
+class SegmentCriteriaError(ValueError):
+    pass
+
+def get_segment_config() -> Dict[str, Any]:
+    """Return the segment refresh settings merged over their defaults"""
+    config = {
+        # Above this many changed rows an incremental run costs more than a full one
+        'MAX_INCREMENTAL_USERS': 50000,
+    }
+    config.update(getattr(settings, 'CRM_SEGMENTS', {}))
+    return config
+
+class SegmentEngine:
+    """Compiles UserSegment.criteria into ORM filters and keeps memberships in sync.
+
+    Criteria look like::
+
+        {"all": [{"field": "progress.total_interviews", "op": "gte", "value": 5},
+                 {"any": [{"field": "subscription_tier", "op": "eq", "value": "elite"},
+                          {"field": "engagement.score", "op": "gte", "value": 200}]}]}
+    """
+    FIELDS = {
+        'subscription_tier': 'subscription_tier',
+        'date_joined': 'date_joined',
+        'last_login': 'last_login',
+        'progress.total_interviews': 'userprogress__total_interviews',
+        'progress.average_interview_score': 'userprogress__average_interview_score',
+        'progress.total_training_hours': 'userprogress__total_training_hours',
+        'progress.current_streak_days': 'userprogress__current_streak_days',
+        'progress.last_active_on': 'userprogress__last_active_on',
+        'subscription.is_active': 'usersubscription__is_active',
+        'subscription.plan_tier': 'usersubscription__plan__tier',
+        'subscription.end_date': 'usersubscription__end_date',
+        'engagement.score': 'userengagementscore__score',
+    }
+    OPERATORS = {
+        'eq': 'exact', 'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte',
+        'in': 'in', 'isnull': 'isnull', 'contains': 'icontains',
+    }
+    # Where to look for users whose segment inputs changed since the last refresh
+    CHANGE_SOURCES = [
+        ('users.User', 'updated_at', 'id'),
+        # update_last_login saves only last_login, so updated_at doesn't move on login
+        ('users.User', 'last_login', 'id'),
+        ('analytics.UserProgress', 'updated_at', 'user_id'),
+        ('subscriptions.UserSubscription', 'updated_at', 'user_id'),
+        ('crm.UserEngagementScore', 'last_calculated', 'user_id'),
+    ]
+
+    _compiled = {}
+
+    @classmethod
+    def compile(cls, segment) -> Q:
+        """Q for the segment's criteria, cached until the segment is edited"""
+        key = (segment.id, segment.updated_at)
+        if key not in cls._compiled:
+            cls._compiled = {k: v for k, v in cls._compiled.items() if k[0] != segment.id}
+            cls._compiled[key] = cls._compile_node(segment.criteria)
+        return cls._compiled[key]
+
+    @classmethod
+    def _compile_node(cls, node) -> Q:
+        if not isinstance(node, dict):
+            raise SegmentCriteriaError(f"Criteria node must be an object: {node!r}")
+        if 'all' in node or 'any' in node:
+            combined = Q()
+            for child in node.get('all', []):
+                combined &= cls._compile_node(child)
+            if 'any' in node:
+                alternatives = Q()
+                for child in node['any']:
+                    alternatives |= cls._compile_node(child)
+                combined &= alternatives
+            return combined
+        if 'not' in node:
+            return ~cls._compile_node(node['not'])
+
+        field, op, value = node.get('field'), node.get('op', 'eq'), node.get('value')
+        if field not in cls.FIELDS:
+            raise SegmentCriteriaError(f"Unknown segment field: {field}")
+        if op == 'within_days':
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise SegmentCriteriaError(f"within_days needs a non-negative whole number of days: {value!r}")
+            return Q(**{f"{cls.FIELDS[field]}__gte": timezone.now() - timedelta(days=value)})
+        if op == 'ne':
+            return ~Q(**{cls.FIELDS[field]: value})
+        if op not in cls.OPERATORS:
+            raise SegmentCriteriaError(f"Unknown segment operator: {op}")
+        return Q(**{f"{cls.FIELDS[field]}__{cls.OPERATORS[op]}": value})
+
+    @classmethod
+    def pending_changes(cls, segments) -> Optional[Dict[int, datetime]]:
+        """Latest input change per user since the oldest of the segments' last runs.
+
+        Scanned once and shared by every segment in a refresh run. Returns None
+        when more rows changed than MAX_INCREMENTAL_USERS (e.g. right after
+        score_engagement touched everyone), meaning a full refresh is cheaper.
+        """
+        from django.apps import apps
+
+        computed = [segment.last_computed_at for segment in segments if segment.last_computed_at]
+        if not computed:
+            return {}
+        since = min(computed)
+        limit = get_segment_config()['MAX_INCREMENTAL_USERS']
+
+        changes = {}
+        for model_label, timestamp, user_field in cls.CHANGE_SOURCES:
+            model = apps.get_model(model_label)
+            rows = list(
+                model.objects.filter(**{f"{timestamp}__gt": since}).values_list(user_field, timestamp)[:limit + 1]
+            )
+            if len(rows) > limit:
+                return None
+            for user_id, changed_at in rows:
+                if user_id not in changes or changed_at > changes[user_id]:
+                    changes[user_id] = changed_at
+            if len(changes) > limit:
+                return None
+        return changes
+
+    @classmethod
+    def refresh(cls, segment, full: bool = False, changes: Optional[Dict[int, datetime]] = None,
+                started: Optional[datetime] = None) -> Dict[str, int]:
+        """Diff the segment's current members against stored memberships.
+
+        Only users whose inputs changed since the last run are re-evaluated,
+        unless this is the first run, `full` is set or too many users changed.
+        Pass `changes` from pending_changes() when refreshing several segments
+        so the change sources are scanned once, with `started` taken before
+        that scan so nothing committed during it is skipped. Relative criteria such as
+        `within_days` drift with time alone, so schedule periodic full runs
+        for segments that use them.
+        """
+        from .models import UserSegmentMembership
+
+        started = started or timezone.now()
+        candidates = None
+        if segment.last_computed_at and not full:
+            if changes is None:
+                changes = cls.pending_changes([segment])
+            if changes is not None:
+                candidates = {
+                    user_id for user_id, changed_at in changes.items() if changed_at > segment.last_computed_at
+                }
+                if not candidates:
+                    segment.last_computed_at = started
+                    segment.save(update_fields=['last_computed_at'])
+                    return {'joined': 0, 'left': 0, 'evaluated': 0}
+
+        users = get_user_model().objects.filter(cls.compile(segment))
+        active = UserSegmentMembership.objects.filter(segment=segment, left_at__isnull=True)
+        if candidates is not None:
+            users = users.filter(id__in=candidates)
+            active = active.filter(user_id__in=candidates)
+
+        current = set(users.values_list('id', flat=True).distinct())
+        stored = set(active.values_list('user_id', flat=True))
+        joining = current - stored
+        leaving = stored - current
+
+        with transaction.atomic():
+            if leaving:
+                UserSegmentMembership.objects.filter(
+                    segment=segment, user_id__in=leaving, left_at__isnull=True
+                ).update(left_at=started)
+            if joining:
+                # Former members keep their row (user, segment is unique); reopen it
+                returning = set(
+                    UserSegmentMembership.objects.filter(
+                        segment=segment, user_id__in=joining
+                    ).values_list('user_id', flat=True)
+                )
+                if returning:
+                    UserSegmentMembership.objects.filter(
+                        segment=segment, user_id__in=returning
+                    ).update(left_at=None, joined_at=started)
+                UserSegmentMembership.objects.bulk_create(
+                    [UserSegmentMembership(user_id=user_id, segment=segment) for user_id in joining - returning],
+                    batch_size=5000,
+                    ignore_conflicts=True
+                )
+            segment.last_computed_at = started
+            segment.save(update_fields=['last_computed_at'])
+
+        return {
+            'joined': len(joining),
+            'left': len(leaving),
+            'evaluated': len(candidates) if candidates is not None else len(current | stored),
+        }
+
+def get_lifecycle_config() -> Dict[str, Any]:
+    """Return the lifecycle rule settings merged over their defaults"""
+    config = {
+        'CHURN_AFTER_DAYS': 30,
+        'ACTIVATION_INTERVIEWS': 1,
+        'CHUNK_SIZE': 10000,
+    }
+    config.update(getattr(settings, 'CRM_LIFECYCLE', {}))
+    return config
+
+class LifecycleEngine:
+    """Moves users between lifecycle stages with one query per rule instead of per-user checks"""
+
+    @staticmethod
+    def _engaged(config) -> Q:
+        from analytics.models import UserProgress
+
+        cutoff = timezone.now() - timedelta(days=config['CHURN_AFTER_DAYS'])
+        return Q(last_login__gte=cutoff) | Exists(
+            UserProgress.objects.filter(user=OuterRef('pk'), last_active_on__gte=cutoff.date())
+        )
+
+    @staticmethod
+    def _activated(config) -> Q:
+        from analytics.models import UserProgress
+
+        return ~Q(subscription_tier='free') | Exists(
+            UserProgress.objects.filter(
+                user=OuterRef('pk'), total_interviews__gte=config['ACTIVATION_INTERVIEWS']
+            )
+        )
+
+    @classmethod
+    def rules(cls, config):
+        """(from stage, to stage, condition, reason); None is a user with no stage yet"""
+        engaged = cls._engaged(config)
+        # Nobody can be idle for CHURN_AFTER_DAYS before they've been around that long
+        cutoff = timezone.now() - timedelta(days=config['CHURN_AFTER_DAYS'])
+        lapsed = ~engaged & Q(date_joined__lt=cutoff)
+        idle = f"No activity for {config['CHURN_AFTER_DAYS']} days"
+        return [
+            (None, 'trial', Q(), 'Signed up'),
+            ('trial', 'active', cls._activated(config) & engaged, 'Activated'),
+            ('trial', 'churned', lapsed, idle),
+            ('active', 'churned', lapsed, idle),
+            ('reactivated', 'churned', lapsed, idle),
+            ('churned', 'reactivated', engaged, 'Returned after churning'),
+        ]
+
+    @classmethod
+    def run(cls, dry_run: bool = False) -> Dict[str, int]:
+        """Apply every rule in order; returns the number of users moved per transition"""
+        from .models import UserLifecycleStage
+
+        config = get_lifecycle_config()
+        User = get_user_model()
+        moved = {}
+        started = timezone.now()
+        for from_stage, to_stage, condition, reason in cls.rules(config):
+            current = UserLifecycleStage.objects.filter(user=OuterRef('pk'), left_at__isnull=True)
+            if from_stage is None:
+                users = User.objects.filter(~Exists(current))
+            else:
+                # A stage opened by an earlier rule in this run waits for the next run
+                users = User.objects.filter(Exists(current.filter(stage=from_stage, entered_at__lt=started)))
+            user_ids = users.filter(condition).order_by('id').values_list('id', flat=True)
+
+            count = 0
+            last_id = 0
+            while True:
+                chunk = list(user_ids.filter(id__gt=last_id)[:config['CHUNK_SIZE']])
+                if not chunk:
+                    break
+                last_id = chunk[-1]
+                count += len(chunk)
+                if not dry_run:
+                    cls.transition(chunk, from_stage, to_stage, reason)
+            moved[f"{from_stage or 'new'}->{to_stage}"] = count
+        return moved
+
+    @staticmethod
+    def transition(user_ids: List[int], from_stage, to_stage: str, reason: str):
+        """Close the users' open stage and open the new one in bulk"""
+        from .models import UserLifecycleStage
+
+        now = timezone.now()
+        with transaction.atomic():
+            if from_stage is not None:
+                UserLifecycleStage.objects.filter(
+                    user_id__in=user_ids, stage=from_stage, left_at__isnull=True
+                ).update(left_at=now)
+            # The partial unique constraint skips anyone who moved concurrently
+            UserLifecycleStage.objects.bulk_create(
+                [UserLifecycleStage(user_id=user_id, stage=to_stage, reason=reason) for user_id in user_ids],
+                batch_size=5000,
+                ignore_conflicts=True
+            )
+
+    @staticmethod
+    def close_duplicate_stages(using: str = 'default') -> int:
+        """Close all but each user's newest open stage; returns the number closed.
+
+        Rows written before unique_current_lifecycle_stage existed can leave a
+        user with several open stages, which would make adding it fail.
+        """
+        from .models import UserLifecycleStage
+
+        newer = UserLifecycleStage.objects.using(using).filter(
+            user=OuterRef('user'), left_at__isnull=True, id__gt=OuterRef('id')
+        )
+        return UserLifecycleStage.objects.using(using).filter(left_at__isnull=True).filter(
+            Exists(newer)
+        ).update(left_at=timezone.now())
@@ -0,0 +1,15 @@
+import logging
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+def close_duplicate_lifecycle_stages(sender, using='default', **kwargs):
+    """Clear duplicate open lifecycle stages before migrate adds the partial unique constraint"""
+    from .models import UserLifecycleStage
+    from .services import LifecycleEngine
+
+    if UserLifecycleStage._meta.db_table not in connections[using].introspection.table_names():
+        return
+    closed = LifecycleEngine.close_duplicate_stages(using=using)
+    if closed:
+        logger.warning(f"Closed {closed} duplicate open lifecycle stages before migrating")
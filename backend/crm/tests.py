@@ -0,0 +1,30 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .attribution import attribution_buffer
+from .models import AdAttribution
+
+class AttributionMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='visitor', email='visitor@example.com', password='secret'
+        )
+        # Write each touch synchronously instead of from the background flush thread
+        patcher = mock.patch.dict(attribution_buffer.config, {'ENABLED': False})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bearer_token_request_ties_cookie_touch_to_user(self):
+        self.client.get('/', {'utm_source': 'newsletter', 'utm_campaign': 'spring'})
+        self.assertFalse(AdAttribution.objects.exists())
+
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        attribution_buffer.flush()
+
+        touches = {row.touch: row for row in AdAttribution.objects.filter(user=self.user)}
+        self.assertEqual(set(touches), {'first', 'last'})
+        self.assertEqual(touches['first'].utm_source, 'newsletter')
+        self.assertEqual(touches['last'].utm_campaign, 'spring')
+        self.assertEqual(response.cookies['attribution'].value, '')
@@ -0,0 +1,12 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from . import views
+
+router = DefaultRouter()
+router.register('segments', views.UserSegmentViewSet, basename='segment')
+router.register('lifecycle', views.UserLifecycleViewSet, basename='lifecycle')
+router.register('analytics', views.AnalyticsViewSet, basename='analytics')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -1,8 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from .models import UserSegment, UserSegmentMembership, UserLifecycleStage, UserEngagementScore
 from .services import HubSpotService, AdAttributionService
 from .serializers import (
@@ -35,6 +37,14 @@ class UserLifecycleViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
 
+    def perform_create(self, serializer):
+        # Only one stage may be open per user; close the current one first
+        with transaction.atomic():
+            UserLifecycleStage.objects.filter(
+                user=self.request.user, left_at__isnull=True
+            ).update(left_at=timezone.now())
+            serializer.save(user=self.request.user)
+
     @action(detail=False, methods=['get'])
     def current_stage(self, request):
         """Get current lifecycle stage for the user"""
@@ -59,12 +69,13 @@ class AnalyticsViewSet(viewsets.ViewSet):
         properties = request.data.get('properties', {})
 
         try:
-            # Track in HubSpot
-            self.hubspot.track_event(
-                event_name,
-                request.user.email,
-                properties
-            )
+            # Queue for HubSpot; deliver_hubspot_outbox sends it in the background
+            with transaction.atomic():
+                self.hubspot.enqueue_event(
+                    event_name,
+                    request.user.email,
+                    properties
+                )
 
             # Track conversion if applicable
             if event_name == 'purchase':
@@ -73,6 +84,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
                     request.user.email,
                     properties.get('value')
                 )
+                self.ad_attribution.record_conversion(request.user, properties.get('value'))
 
             return Response({'status': 'success'})
         except Exception as e:
@@ -83,13 +95,11 @@ class AnalyticsViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def engagement_score(self, request):
-        """Get user engagement score"""
+        """Get user engagement score, as computed by the nightly score_engagement job"""
         try:
-            score, created = UserEngagementScore.objects.get_or_create(
-                user=request.user
-            )
-            if created or (timezone.now() - score.last_calculated).days >= 1:
-                score.calculate_score()
+            score = UserEngagementScore.objects.filter(user=request.user).first()
+            if score is None:
+                return Response({'score': 0, 'factors': {}, 'last_calculated': None})
             serializer = UserEngagementScoreSerializer(score)
             return Response(serializer.data)
         except Exception as e:
@@ -100,12 +110,21 @@ class AnalyticsViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def attribution(self, request):
-        """Get ad attribution data for the user"""
+        """Get first- and last-touch ad attribution for the user"""
         try:
-            utm_params = self.ad_attribution.parse_utm_parameters(request)
-            return Response(utm_params)
+            return Response(self.ad_attribution.get_attribution(request.user))
         except Exception as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            ) 
\ No newline at end of file
+            ) 
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def campaign_report(self, request):
+        """Campaign visits and conversions; ?touch=first|last picks the credit model"""
+        touch = request.query_params.get('touch', 'last')
+        if touch not in ('first', 'last'):
+            return Response({'error': 'touch must be first or last'}, status=status.HTTP_400_BAD_REQUEST)
+        start = parse_date(request.query_params.get('start', '') or '')
+        end = parse_date(request.query_params.get('end', '') or '')
+        return Response(self.ad_attribution.campaign_report(start, end, touch))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from interviews.services import ScorePercentileService
+
+class Command(BaseCommand):
+    help = 'Recompute the score percentile histograms from all interview assessments'
+
+    def handle(self, *args, **options):
+        count = ScorePercentileService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} score histograms"))
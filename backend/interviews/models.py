@@ -45,3 +45,16 @@ class InterviewAssessment(models.Model):
 
     def __str__(self):
         return f"Assessment for {self.interview}"
+
+class ScoreHistogram(models.Model):
+    """Persisted 0-100 score counts per interviewer type and assessment category"""
+    interviewer_type = models.CharField(max_length=20)  # An Interview.INTERVIEWER_TYPES value, or 'all'
+    category = models.CharField(max_length=30)
+    counts = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('interviewer_type', 'category')
+
+    def __str__(self):
+        return f"{self.interviewer_type} - {self.category}"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Interview, InterviewAssessment
+from .services import ScorePercentileService
 
 class InterviewAssessmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,12 +10,19 @@ class InterviewAssessmentSerializer(serializers.ModelSerializer):
 
 class InterviewSerializer(serializers.ModelSerializer):
     assessment = InterviewAssessmentSerializer(read_only=True)
+    score_percentiles = serializers.SerializerMethodField()
     
     class Meta:
         model = Interview
         fields = '__all__'
         read_only_fields = ('user', 'created_at', 'completed_at', 'is_completed')
 
+    def get_score_percentiles(self, obj):
+        assessment = getattr(obj, 'assessment', None)
+        if assessment is None:
+            return None
+        return ScorePercentileService.for_assessment(assessment, obj.interviewer_type)
+
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
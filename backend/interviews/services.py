@@ -1,8 +1,13 @@
 import asyncio
 import aiohttp
+import threading
+import time
+import logging
+import numpy as np
 from django.conf import settings
-from .models import Interview
-from typing import List, Dict
+from django.db import models, transaction
+from .models import Interview, InterviewAssessment, ScoreHistogram
+from typing import List, Dict, Optional
 import json
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
@@ -10,6 +15,8 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.platypus.tables import getSampleStyleSheet
 
+logger = logging.getLogger(__name__)
+
 class InterviewService:
     def __init__(self):
         self.current_task = None
@@ -283,4 +290,170 @@ Format the response as a JSON object with these fields:
             return buffer.getvalue()
 
         except Exception as e:
-            raise Exception(f'Error generating PDF report: {str(e)}') 
\ No newline at end of file
+            raise Exception(f'Error generating PDF report: {str(e)}')
+
+class ScorePercentileService:
+    """Percentile and rank lookups from in-memory score histograms.
+
+    Each (interviewer_type, category) keeps a 101-bin count array plus its
+    cumulative sum, so a lookup is two array reads. New assessments update
+    the local arrays immediately and accumulate as deltas that are added to
+    ScoreHistogram every PERSIST_INTERVAL seconds, which also pulls in the
+    counts recorded by other processes.
+    """
+    BINS = 101
+    ALL_TYPES = 'all'
+    CATEGORIES = {
+        'overall': 'overall_score',
+        'domain_expertise': 'domain_expertise_score',
+        'communication': 'communication_score',
+        'culture_fit': 'culture_fit_score',
+        'problem_solving': 'problem_solving_score',
+        'self_awareness': 'self_awareness_score',
+    }
+
+    _lock = threading.Lock()
+    _counts: Optional[Dict] = None
+    _cumulative: Dict = {}
+    _pending: Dict = {}
+    _last_sync = 0.0
+
+    @classmethod
+    def persist_interval(cls) -> float:
+        return getattr(settings, 'SCORE_HISTOGRAM_PERSIST_INTERVAL', 60)
+
+    @classmethod
+    def record(cls, assessment: InterviewAssessment, interviewer_type: str):
+        with cls._lock:
+            cls._ensure_loaded()
+            for category, field in cls.CATEGORIES.items():
+                score = cls._bin(getattr(assessment, field))
+                for key in ((interviewer_type, category), (cls.ALL_TYPES, category)):
+                    cls._counts.setdefault(key, np.zeros(cls.BINS, dtype=np.int64))[score] += 1
+                    cls._pending.setdefault(key, np.zeros(cls.BINS, dtype=np.int64))[score] += 1
+                    cls._cumulative.pop(key, None)
+        cls._maybe_sync()
+
+    @classmethod
+    def lookup(cls, interviewer_type: str, category: str, score: int) -> Optional[Dict]:
+        """Percentile (share of scores below, counting ties as half) and 1-based rank"""
+        cls._maybe_sync()
+        with cls._lock:
+            cls._ensure_loaded()
+            key = (interviewer_type, category)
+            counts = cls._counts.get(key)
+            if counts is None:
+                return None
+            cumulative = cls._cumulative.get(key)
+            if cumulative is None:
+                cumulative = cls._cumulative[key] = np.cumsum(counts)
+        total = int(cumulative[-1])
+        if not total:
+            return None
+        score = cls._bin(score)
+        below = int(cumulative[score - 1]) if score else 0
+        at_or_below = int(cumulative[score])
+        return {
+            'score': score,
+            'percentile': round((below + 0.5 * (at_or_below - below)) / total * 100, 1),
+            'rank': total - at_or_below + 1,
+            'out_of': total,
+        }
+
+    @classmethod
+    def for_assessment(cls, assessment: InterviewAssessment, interviewer_type: str) -> Dict:
+        return {
+            category: {
+                'by_interviewer_type': cls.lookup(interviewer_type, category, getattr(assessment, field)),
+                'overall': cls.lookup(cls.ALL_TYPES, category, getattr(assessment, field)),
+            }
+            for category, field in cls.CATEGORIES.items()
+        }
+
+    @classmethod
+    def sync(cls):
+        """Add pending deltas to the persisted histograms and reload the merged counts"""
+        with cls._lock:
+            pending, cls._pending = cls._pending, {}
+        try:
+            with transaction.atomic():
+                for (interviewer_type, category), delta in pending.items():
+                    histogram, _ = ScoreHistogram.objects.select_for_update().get_or_create(
+                        interviewer_type=interviewer_type,
+                        category=category,
+                        defaults={'counts': [0] * cls.BINS}
+                    )
+                    histogram.counts = (cls._array(histogram.counts) + delta).tolist()
+                    histogram.save(update_fields=['counts', 'updated_at'])
+        except Exception:
+            # Keep the deltas for the next attempt
+            with cls._lock:
+                for key, delta in pending.items():
+                    cls._pending[key] = cls._pending.get(key, np.zeros(cls.BINS, dtype=np.int64)) + delta
+            raise
+
+        persisted = cls._load()
+        with cls._lock:
+            # Deltas recorded while we were writing aren't in the DB yet
+            for key, delta in cls._pending.items():
+                persisted[key] = persisted.get(key, np.zeros(cls.BINS, dtype=np.int64)) + delta
+            cls._counts = persisted
+            cls._cumulative = {}
+            cls._last_sync = time.monotonic()
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every histogram from InterviewAssessment with one grouped query per category"""
+        histograms = {}
+        for category, field in cls.CATEGORIES.items():
+            rows = InterviewAssessment.objects.values_list(
+                'interview__interviewer_type', field
+            ).annotate(n=models.Count('id')).order_by()
+            for interviewer_type, score, n in rows:
+                for key in ((interviewer_type, category), (cls.ALL_TYPES, category)):
+                    histograms.setdefault(key, np.zeros(cls.BINS, dtype=np.int64))[cls._bin(score)] += n
+
+        with transaction.atomic():
+            ScoreHistogram.objects.all().delete()
+            ScoreHistogram.objects.bulk_create([
+                ScoreHistogram(interviewer_type=interviewer_type, category=category, counts=counts.tolist())
+                for (interviewer_type, category), counts in histograms.items()
+            ])
+        with cls._lock:
+            cls._counts = histograms
+            cls._cumulative = {}
+            cls._pending = {}
+            cls._last_sync = time.monotonic()
+        return len(histograms)
+
+    @classmethod
+    def _maybe_sync(cls):
+        if time.monotonic() - cls._last_sync >= cls.persist_interval():
+            try:
+                cls.sync()
+            except Exception as e:
+                logger.error(f"Error persisting score histograms: {e}")
+
+    @classmethod
+    def _ensure_loaded(cls):
+        # Called with the lock held
+        if cls._counts is None:
+            cls._counts = cls._load()
+            cls._last_sync = time.monotonic()
+
+    @classmethod
+    def _load(cls) -> Dict:
+        return {
+            (histogram.interviewer_type, histogram.category): cls._array(histogram.counts)
+            for histogram in ScoreHistogram.objects.all()
+        }
+
+    @classmethod
+    def _array(cls, counts) -> np.ndarray:
+        array = np.zeros(cls.BINS, dtype=np.int64)
+        array[:len(counts)] = counts[:cls.BINS]
+        return array
+
+    @classmethod
+    def _bin(cls, score) -> int:
+        return int(min(max(round(score or 0), 0), cls.BINS - 1))
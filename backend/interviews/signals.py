@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Interview, InterviewAssessment
+from .services import ScorePercentileService
+
+@receiver(post_save, sender=InterviewAssessment)
+def record_assessment_scores(sender, instance, created, **kwargs):
+    """Fold new assessment scores into the percentile histograms once committed"""
+    if not created or kwargs.get('raw'):
+        return
+    interviewer_type = Interview.objects.filter(
+        pk=instance.interview_id
+    ).values_list('interviewer_type', flat=True).get()
+    transaction.on_commit(lambda: ScorePercentileService.record(instance, interviewer_type))
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from .models import ChatInteraction
+
+def get_history_config() -> Dict[str, Any]:
+    """Return the chat history settings merged over their defaults"""
+    config = {
+        # 'cache' shares history across workers through Django's cache; 'redis' uses the
+        # channel-layer Redis directly; 'memory' keeps it per process
+        'BACKEND': 'cache',
+        'KEY_PREFIX': 'support:history',
+        'MAX_EXCHANGES': 5,
+        'TTL': 30 * 60,  # seconds since the session's last message
+        'MAX_SESSIONS': 10000,  # in-memory backend only
+    }
+    config.update(getattr(settings, 'SUPPORT_CHAT_HISTORY', {}))
+    return config
+
+class InMemoryChatHistoryStore:
+    """Process-local history with LRU eviction; other workers fall back to ChatInteraction on a miss"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self._sessions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._sessions.pop(key, None)
+                return None
+            self._sessions.move_to_end(key)
+            return list(entry[1])
+
+    async def store(self, key: str, exchanges: List[Dict[str, str]]) -> None:
+        with self._lock:
+            self._sessions[key] = (
+                time.monotonic() + self.config['TTL'],
+                exchanges[-self.config['MAX_EXCHANGES']:]
+            )
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.config['MAX_SESSIONS']:
+                self._sessions.popitem(last=False)
+
+    async def append(self, key: str, exchange: Dict[str, str]) -> None:
+        with self._lock:
+            entry = self._sessions.get(key)
+            exchanges = list(entry[1]) if entry and entry[0] >= time.monotonic() else []
+        await self.store(key, exchanges + [exchange])
+
+class CacheChatHistoryStore:
+    """History as one capped list per session in Django's shared cache"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+
+    async def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        return await cache.aget(key)
+
+    async def store(self, key: str, exchanges: List[Dict[str, str]]) -> None:
+        await cache.aset(key, exchanges[-self.config['MAX_EXCHANGES']:], self.config['TTL'])
+
+    async def append(self, key: str, exchange: Dict[str, str]) -> None:
+        # Messages in one session arrive one after another, so read-modify-write is enough
+        exchanges = await cache.aget(key) or []
+        await self.store(key, exchanges + [exchange])
+
+class RedisChatHistoryStore:
+    """History as capped Redis lists on the channel-layer Redis"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.host, self.port = settings.CHANNEL_LAYERS['default']['CONFIG']['hosts'][0]
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        """Client for the running event loop; adrf views under WSGI run each request on a fresh
+        loop, and pooled connections can't cross loops"""
+        import redis.asyncio as redis
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = redis.Redis(host=self.host, port=self.port)
+        return client
+
+    async def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        raw = await self.client.lrange(key, 0, -1)
+        if not raw:
+            return None
+        return [json.loads(item) for item in raw]
+
+    async def store(self, key: str, exchanges: List[Dict[str, str]]) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            if exchanges:
+                pipe.rpush(key, *[json.dumps(exchange) for exchange in exchanges])
+            pipe.ltrim(key, -self.config['MAX_EXCHANGES'], -1)
+            pipe.expire(key, self.config['TTL'])
+            await pipe.execute()
+
+    async def append(self, key: str, exchange: Dict[str, str]) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, json.dumps(exchange))
+            pipe.ltrim(key, -self.config['MAX_EXCHANGES'], -1)
+            pipe.expire(key, self.config['TTL'])
+            await pipe.execute()
+
+class ChatHistory:
+    """Last few exchanges of a support chat session; one cache read per message once warm"""
+
+    STORES = {
+        'cache': CacheChatHistoryStore,
+        'redis': RedisChatHistoryStore,
+        'memory': InMemoryChatHistoryStore,
+    }
+
+    _store = None
+
+    def __init__(self):
+        self.config = get_history_config()
+
+    @property
+    def store(self):
+        if ChatHistory._store is None:
+            ChatHistory._store = self.STORES[self.config['BACKEND']](self.config)
+        return ChatHistory._store
+
+    def _key(self, user_id: int, session_id: str) -> str:
+        # Scoped to the user so a guessed session id never exposes someone else's chat
+        return f"{self.config['KEY_PREFIX']}:{user_id}:{session_id}"
+
+    async def get(self, user_id: int, session_id: str) -> List[Dict[str, str]]:
+        """Oldest-first exchanges, reloaded from ChatInteraction when the cache is cold"""
+        key = self._key(user_id, session_id)
+        exchanges = await self.store.get(key)
+        if exchanges is not None:
+            return exchanges
+
+        rows = [
+            row async for row in ChatInteraction.objects.filter(
+                user_id=user_id, session_id=session_id
+            ).order_by('-created_at').values(
+                'user_message', 'system_response', 'intent__name'
+            )[:self.config['MAX_EXCHANGES']]
+        ]
+        exchanges = [
+            {'user': row['user_message'], 'assistant': row['system_response'], 'intent': row['intent__name'] or ''}
+            for row in reversed(rows)
+        ]
+        if exchanges:
+            await self.store.store(key, exchanges)
+        return exchanges
+
+    async def append(self, user_id: int, session_id: str, message: str, response: str, intent: str = '') -> None:
+        await self.store.append(
+            self._key(user_id, session_id),
+            {'user': message, 'assistant': response, 'intent': intent or ''}
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from support.models import SupportTicket
+
+class Command(BaseCommand):
+    help = 'Flag tickets from before queued helpdesk sync that never got an external id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requeue', action='store_true', help='Queue them for sync instead of marking them failed')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many tickets would change')
+
+    def handle(self, *args, **options):
+        # Pre-queue rows got sync_status 'synced' from the column's db_default; the ones the
+        # old inline push never confirmed have no external_id and were never attempted since
+        tickets = SupportTicket.objects.filter(sync_status='synced', external_id='', sync_attempts=0)
+        if options['dry_run']:
+            self.stdout.write(f"{tickets.count()} legacy tickets have no helpdesk id")
+            return
+        if options['requeue']:
+            updated = tickets.update(sync_status='pending', sync_error='')
+            self.stdout.write(self.style.SUCCESS(f"Queued {updated} legacy tickets for helpdesk sync"))
+        else:
+            updated = tickets.update(sync_status='failed', sync_error='Created before queued sync; no helpdesk id recorded')
+            self.stdout.write(self.style.SUCCESS(f"Marked {updated} legacy tickets as failed"))
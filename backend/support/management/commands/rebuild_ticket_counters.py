@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from support.models import SupportTicket, SupportTicketCounter
+
+class Command(BaseCommand):
+    help = 'Recompute SupportTicketCounter from the tickets table, e.g. after bulk updates that skip signals'
+
+    def handle(self, *args, **options):
+        counters = [
+            SupportTicketCounter(scope='status', key=row['status'], count=row['total'])
+            for row in SupportTicket.objects.values('status').annotate(total=Count('id')).order_by()
+        ]
+        counters += [
+            SupportTicketCounter(scope='day', key=row['day'].isoformat(), count=row['total'])
+            for row in SupportTicket.objects.annotate(day=TruncDate('created_at'))
+            .values('day').annotate(total=Count('id')).order_by()
+        ]
+        with transaction.atomic():
+            SupportTicketCounter.objects.all().delete()
+            SupportTicketCounter.objects.bulk_create(counters, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(counters)} ticket counters"))
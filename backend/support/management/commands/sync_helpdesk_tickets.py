@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from support.services import HelpdeskSyncWorker
+
+class Command(BaseCommand):
+    help = 'Create pending support tickets in the external helpdesk, retrying with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when drained')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        worker = HelpdeskSyncWorker()
+        if not worker.configured:
+            self.stderr.write('HELPDESK_API_KEY and HELPDESK_DOMAIN are not set; nothing to sync.')
+            return
+        while True:
+            stats = worker.drain()
+            if any(stats.values()):
+                self.stdout.write(
+                    f"Synced {stats['synced']}, retrying {stats['retrying']}, failed {stats['failed']}"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,126 @@
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from django.core.cache import cache
+from .models import SupportIntent, FAQ
+
+def normalize(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+def is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+class AhoCorasick:
+    """Multi-keyword automaton: one pass over the text finds every keyword occurrence"""
+
+    def __init__(self, keywords: List[Tuple[str, object]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]
+        for keyword, payload in keywords:
+            self._add(keyword, payload)
+        self._link()
+
+    def _add(self, keyword: str, payload):
+        node = 0
+        for char in keyword:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append((len(keyword), payload))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Inherit shorter keywords that end at the same position
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str):
+        """Yield (start, end, payload) for every keyword occurrence in text"""
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, payload in self._output[node]:
+                yield position - length + 1, position + 1, payload
+
+class IntentMatcher:
+    """Process-wide keyword automaton over active intents, with their FAQs preloaded.
+
+    Keywords are plain strings (weight 1) or ``{"keyword": "...", "weight": 2.5}``.
+    """
+    VERSION_KEY = 'support:intent_matcher:version'
+
+    _instance = None
+    _version = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.intents: Dict[int, SupportIntent] = {}
+        self.faqs: Dict[int, FAQ] = {}
+        keywords = []
+        for intent in SupportIntent.objects.filter(is_active=True).order_by('id'):
+            self.intents[intent.id] = intent
+            for entry in intent.keywords or []:
+                if isinstance(entry, dict):
+                    keyword, weight = entry.get('keyword', ''), float(entry.get('weight', 1))
+                else:
+                    keyword, weight = str(entry), 1.0
+                keyword = normalize(keyword)
+                if keyword:
+                    keywords.append((keyword, (intent.id, weight)))
+        for faq in FAQ.objects.filter(is_active=True, intent_id__in=self.intents).order_by('-id'):
+            # Descending id, so the oldest FAQ per intent wins, as before
+            self.faqs[faq.intent_id] = faq
+        self.automaton = AhoCorasick(keywords)
+
+    @classmethod
+    def get(cls) -> 'IntentMatcher':
+        version = cache.get(cls.VERSION_KEY, 0)
+        if cls._instance is None or cls._version != version:
+            with cls._lock:
+                if cls._instance is None or cls._version != version:
+                    cls._instance = cls()
+                    cls._version = version
+        return cls._instance
+
+    @classmethod
+    def invalidate(cls):
+        # Bump the shared version so every worker rebuilds on its next match
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+        cls._instance = None
+
+    def match(self, message: str) -> List[Tuple[SupportIntent, float]]:
+        """Intents whose keywords occur as whole words, by descending total weight"""
+        text = normalize(message)
+        scores: Dict[int, float] = {}
+        for start, end, (intent_id, weight) in self.automaton.find(text):
+            if start > 0 and is_word_char(text[start - 1]):
+                continue
+            if end < len(text) and is_word_char(text[end]):
+                continue
+            scores[intent_id] = scores.get(intent_id, 0.0) + weight
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.intents[intent_id], score) for intent_id, score in ranked]
+
+    def best_faq(self, message: str) -> Optional[Tuple[SupportIntent, FAQ, float]]:
+        """Highest-weighted matching intent that has an FAQ to answer with"""
+        for intent, score in self.match(message):
+            faq = self.faqs.get(intent.id)
+            if faq is not None:
+                return intent, faq, score
+        return None
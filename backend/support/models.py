@@ -63,11 +63,29 @@ class SupportTicket(models.Model):
         ('urgent', 'Urgent'),
     ], default='medium')
     source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='chat')
+    SYNC_STATUS_CHOICES = [
+        ('pending', 'Pending Sync'),
+        ('synced', 'Synced'),
+        ('failed', 'Sync Failed'),
+    ]
+
     external_id = models.CharField(max_length=100, blank=True, help_text="ID in external helpdesk system")
+    # New tickets queue for sync; db_default marks rows that predate the queue as synced so
+    # adding the column doesn't push the whole ticket history to the helpdesk again
+    sync_status = models.CharField(max_length=20, choices=SYNC_STATUS_CHOICES, default='pending', db_default='synced')
+    sync_attempts = models.IntegerField(default=0)
+    next_sync_at = models.DateTimeField(default=timezone.now)
+    sync_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['sync_status', 'next_sync_at'], name='ticket_sync_due_idx'),
+            models.Index(fields=['status', 'priority', 'created_at'], name='ticket_queue_idx'),
+        ]
+
     def __str__(self):
         return f"Ticket #{self.id}: {self.subject}"
     
@@ -76,6 +94,30 @@ class SupportTicket(models.Model):
         self.resolved_at = timezone.now()
         self.save()
 
+class SupportTicketCounter(models.Model):
+    """Ticket counts kept current on write: tickets created per day, and open tickets per status"""
+    SCOPE_CHOICES = [
+        ('day', 'Created per Day'),
+        ('status', 'Current per Status'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=20)  # ISO date for day, status value for status
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_ticket_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}: {self.count}"
+
+    @classmethod
+    def increment(cls, scope: str, key: str, amount: int = 1):
+        counter, _ = cls.objects.get_or_create(scope=scope, key=key)
+        cls.objects.filter(pk=counter.pk).update(count=models.F('count') + amount)
+
 class ChatInteraction(models.Model):
     """Records of chat interactions between users and the support system"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_interactions')
@@ -87,6 +129,12 @@ class ChatInteraction(models.Model):
     escalated = models.BooleanField(default=False)
     ticket = models.ForeignKey(SupportTicket, on_delete=models.SET_NULL, null=True, blank=True, related_name='chat_interactions')
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Cold reloads of a session's recent history
+            models.Index(fields=['session_id', 'created_at'], name='chat_session_history_idx'),
+        ]
     
     def __str__(self):
         return f"Chat with {self.user} on {self.created_at.strftime('%Y-%m-%d %H:%M')}"
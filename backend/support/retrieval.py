@@ -0,0 +1,168 @@
+import math
+import re
+import threading
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import FAQ
+
+TOKEN_RE = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'a an and are as at be but by can do does for from how i if in is it me my of on or '
+    'so that the this to was what when where which who why will with you your'.split()
+)
+
+def get_faq_search_config() -> Dict[str, Any]:
+    """Return the FAQ retrieval settings merged over their defaults"""
+    config = {
+        'K1': 1.5,
+        'B': 0.75,
+        'QUESTION_WEIGHT': 2,  # question terms count this many times over answer terms
+        'DIRECT_ANSWER_RELEVANCE': 0.6,  # answer from the FAQ without calling the LLM
+        'GROUNDING_K': 3,
+        # Seconds catch-up re-reads before the last sync, for saves that committed late
+        'CATCH_UP_OVERLAP': 60,
+    }
+    config.update(getattr(settings, 'SUPPORT_FAQ_SEARCH', {}))
+    return config
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+class FAQIndex:
+    """In-process BM25 inverted index over active FAQ questions and answers.
+
+    Built on first use in each process. Saves are applied incrementally: workers
+    re-read FAQs updated since their last sync when the shared change marker
+    moves. Deletes bump a version that forces a rebuild.
+    """
+    CHANGED_KEY = 'support:faq_index:changed_at'
+    VERSION_KEY = 'support:faq_index:version'
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.config = get_faq_search_config()
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.docs: Dict[int, Dict[str, Any]] = {}
+        self.total_length = 0
+        self.version = cache.get(self.VERSION_KEY, 0)
+        self.synced_at = timezone.now()
+        for faq in FAQ.objects.filter(is_active=True):
+            self.upsert(faq)
+
+    @classmethod
+    def get(cls) -> 'FAQIndex':
+        with cls._lock:
+            index = cls._instance
+            if index is None or index.version != cache.get(cls.VERSION_KEY, 0):
+                index = cls._instance = cls()
+            else:
+                changed_at = cache.get(cls.CHANGED_KEY)
+                if changed_at and changed_at > index.synced_at:
+                    index.catch_up()
+        return index
+
+    @classmethod
+    def faq_saved(cls, faq):
+        cache.set(cls.CHANGED_KEY, timezone.now(), None)
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.upsert(faq)
+
+    @classmethod
+    def faq_deleted(cls, faq):
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, 1, None)
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.remove(faq.id)
+                cls._instance.version = cache.get(cls.VERSION_KEY, 0)
+
+    def catch_up(self):
+        """Apply FAQs saved by other processes since this index last synced.
+
+        updated_at is stamped when a save runs, not when it commits, so a save
+        still in flight at the last sync carries an earlier timestamp. Re-reading
+        an overlap window picks it up; upserting twice is harmless.
+        """
+        started = timezone.now()
+        since = self.synced_at - timedelta(seconds=self.config['CATCH_UP_OVERLAP'])
+        for faq in FAQ.objects.filter(updated_at__gte=since):
+            self.upsert(faq)
+        self.synced_at = started
+
+    def upsert(self, faq):
+        self.remove(faq.id)
+        if not faq.is_active:
+            return
+        terms = Counter(tokenize(faq.question) * self.config['QUESTION_WEIGHT'] + tokenize(faq.answer))
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[faq.id] = frequency
+        length = sum(terms.values())
+        self.docs[faq.id] = {
+            'id': faq.id,
+            'question': faq.question,
+            'answer': faq.answer,
+            'category': faq.category,
+            'intent_id': faq.intent_id,
+            'length': length,
+            'terms': list(terms),
+        }
+        self.total_length += length
+
+    def remove(self, faq_id: int):
+        doc = self.docs.pop(faq_id, None)
+        if doc is None:
+            return
+        for term in doc['terms']:
+            postings = self.postings.get(term, {})
+            postings.pop(faq_id, None)
+            if not postings:
+                self.postings.pop(term, None)
+        self.total_length -= doc['length']
+
+    def idf(self, term: str) -> float:
+        frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Top FAQs by BM25, each with a 0-1 relevance against the query's best possible score"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        k1, b = self.config['K1'], self.config['B']
+        # Saves and deletes mutate postings/docs in place under the same lock
+        with self._lock:
+            if not self.docs:
+                return []
+            average_length = self.total_length / len(self.docs)
+            scores: Dict[int, float] = {}
+            ceiling = 0.0
+            for term in terms:
+                idf = self.idf(term)
+                ceiling += idf * (k1 + 1)
+                for faq_id, frequency in self.postings.get(term, {}).items():
+                    norm = k1 * (1 - b + b * self.docs[faq_id]['length'] / average_length)
+                    scores[faq_id] = scores.get(faq_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [
+                {
+                    **{key: value for key, value in self.docs[faq_id].items() if key not in ('length', 'terms')},
+                    'score': score,
+                    'relevance': min(1.0, score / ceiling) if ceiling else 0.0,
+                }
+                for faq_id, score in ranked
+            ]
+
+    def direct_answer(self, hits: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if hits and hits[0]['relevance'] >= self.config['DIRECT_ANSWER_RELEVANCE']:
+            return hits[0]
+        return None
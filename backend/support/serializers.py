@@ -25,9 +25,12 @@ class SupportTicketSerializer(serializers.ModelSerializer):
             'id', 'user', 'user_email', 'user_name', 'subject', 'description',
             'browser_info', 'last_url', 'session_id', 'console_log',
             'transcript_snippet', 'status', 'priority', 'source',
-            'external_id', 'created_at', 'updated_at', 'resolved_at'
+            'external_id', 'sync_status', 'created_at', 'updated_at', 'resolved_at'
+        ]
+        read_only_fields = [
+            'id', 'user_email', 'user_name', 'external_id', 'sync_status',
+            'created_at', 'updated_at', 'resolved_at'
         ]
-        read_only_fields = ['id', 'user_email', 'user_name', 'created_at', 'updated_at', 'resolved_at']
 
 class SupportTicketCreateSerializer(serializers.ModelSerializer):
     class Meta:
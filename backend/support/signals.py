@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.utils import timezone
+from django.dispatch import receiver
+from .matcher import IntentMatcher
+from .retrieval import FAQIndex
+from .models import SupportIntent, FAQ, SupportTicket, SupportTicketCounter
+
+@receiver(post_save, sender=SupportIntent)
+@receiver(post_delete, sender=SupportIntent)
+@receiver(post_save, sender=FAQ)
+@receiver(post_delete, sender=FAQ)
+def invalidate_intent_matcher(sender, **kwargs):
+    """Rebuild the keyword automaton and preloaded FAQs after the catalog changes.
+
+    Deferred to commit so a rebuild can't load the catalog before the change is visible.
+    """
+    transaction.on_commit(IntentMatcher.invalidate)
+
+@receiver(post_save, sender=FAQ)
+def index_faq(sender, instance, **kwargs):
+    # After commit, so other workers catching up on the change marker can see the row
+    transaction.on_commit(lambda: FAQIndex.faq_saved(instance))
+
+@receiver(post_delete, sender=FAQ)
+def unindex_faq(sender, instance, **kwargs):
+    transaction.on_commit(lambda: FAQIndex.faq_deleted(instance))
+
+@receiver(pre_save, sender=SupportTicket)
+def remember_ticket_status(sender, instance, **kwargs):
+    """Note the stored status so post_save can move the per-status counters"""
+    instance._previous_status = (
+        sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        if instance.pk else None
+    )
+
+@receiver(post_save, sender=SupportTicket)
+def count_ticket(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if created:
+        SupportTicketCounter.increment('day', timezone.localdate(instance.created_at).isoformat())
+        SupportTicketCounter.increment('status', instance.status)
+        return
+    previous = getattr(instance, '_previous_status', None)
+    if previous and previous != instance.status:
+        SupportTicketCounter.increment('status', previous, -1)
+        SupportTicketCounter.increment('status', instance.status)
+
+@receiver(post_delete, sender=SupportTicket)
+def uncount_ticket(sender, instance, **kwargs):
+    SupportTicketCounter.increment('status', instance.status, -1)
@@ -1,3 +1,36 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from .services import SupportService
 
-# Create your tests here.
+class ChatStreamViewTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username='customer', email='customer@example.com', password='secret'
+        )
+        self.token = RefreshToken.for_user(user).access_token
+
+    def test_first_chunk_is_flushed_before_the_answer_finishes(self):
+        progress = []
+
+        async def stream_chat_message(service, **kwargs):
+            yield 'token', 'Hello'
+            progress.append('upstream finished')
+            yield 'done', {'response': 'Hello'}
+
+        with mock.patch.object(SupportService, 'stream_chat_message', stream_chat_message):
+            response = self.client.post(
+                '/api/support/chat/stream/', {'message': 'Hi'},
+                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.token}'
+            )
+            self.assertEqual(response.status_code, 200)
+            chunks = iter(response.streaming_content)
+
+            first = next(chunks)
+            self.assertEqual(progress, [])
+            self.assertEqual(first, b'event: token\ndata: {"text": "Hello"}\n\n')
+
+            rest = b''.join(chunks)
+        self.assertEqual(progress, ['upstream finished'])
+        self.assertIn(b'event: done', rest)
@@ -10,5 +10,6 @@ router.register('csat', views.CSATRatingViewSet, basename='csat')
 urlpatterns = [
     path('', include(router.urls)),
     path('chat/', views.ChatViewSet.as_view(), name='chat'),
+    path('chat/stream/', views.ChatStreamView.as_view(), name='chat-stream'),
     path('report-problem/', views.ProblemReportView.as_view(), name='report-problem'),
 ]
\ No newline at end of file
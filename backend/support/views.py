@@ -1,16 +1,24 @@
+import json
+from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import views, viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from adrf.views import APIView as AsyncAPIView
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from .models import SupportIntent, FAQ, SupportTicket, ChatInteraction, CSATRating
+from .models import SupportIntent, FAQ, SupportTicket, SupportTicketCounter, ChatInteraction, CSATRating
 from .serializers import (
     SupportIntentSerializer, FAQSerializer, SupportTicketSerializer,
     SupportTicketCreateSerializer, ChatInteractionSerializer, 
     ChatMessageSerializer, CSATRatingSerializer
 )
-from .services import SupportService
+from .retrieval import FAQIndex
+from .services import SupportService, iterate_in_new_loop
 
 class FAQViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for displaying FAQs"""
@@ -32,9 +40,29 @@ class FAQViewSet(viewsets.ReadOnlyModelViewSet):
         
         return Response(categories)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Rank FAQs for ?q= with the in-process BM25 index"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 5)), 20))
+        except ValueError:
+            limit = 5
+        return Response(FAQIndex.get().search(query, limit=limit))
+
+class TicketQueuePagination(CursorPagination):
+    """Keyset pagination, newest first; with status/priority filters it walks ticket_queue_idx"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
 class SupportTicketViewSet(viewsets.ModelViewSet):
-    """ViewSet for support tickets"""
+    """ViewSet for support tickets; for staff the list is the support queue"""
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TicketQueuePagination
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -43,9 +71,30 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
-        if user.is_staff:
-            return SupportTicket.objects.all()
-        return SupportTicket.objects.filter(user=user)
+        tickets = SupportTicket.objects.select_related('user')
+        if not user.is_staff:
+            return tickets.filter(user=user)
+        if self.action == 'list':
+            for field in ('status', 'priority'):
+                values = self.request.query_params.getlist(field)
+                if values:
+                    tickets = tickets.filter(**{f"{field}__in": values})
+        return tickets
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def counts(self, request):
+        """Open tickets per status and tickets created today, from the write-time counters"""
+        counters = SupportTicketCounter.objects.filter(
+            Q(scope='status') | Q(scope='day', key=timezone.localdate().isoformat())
+        )
+        by_status = {value: 0 for value, _ in SupportTicket.STATUS_CHOICES}
+        today = 0
+        for counter in counters:
+            if counter.scope == 'status':
+                by_status[counter.key] = counter.count
+            else:
+                today = counter.count
+        return Response({'by_status': by_status, 'created_today': today})
     
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
@@ -54,8 +103,8 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         ticket.resolve()
         return Response({'status': 'ticket resolved'})
 
-class ChatViewSet(views.APIView):
-    """API for chat interactions"""
+class ChatViewSet(AsyncAPIView):
+    """API for chat interactions; async end to end, so a worker serves many chats at once"""
     permission_classes = [permissions.IsAuthenticated]
     
     async def post(self, request):
@@ -73,7 +122,41 @@ class ChatViewSet(views.APIView):
             return Response(response)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProblemReportView(views.APIView):
+class ChatStreamView(AsyncAPIView):
+    """Chat over Server-Sent Events: `token` events as the answer is generated, then one `done` event.
+
+    ASGI servers consume the async stream directly. Django buffers an async
+    iterator completely under WSGI, so there it is driven as a sync iterator.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def post(self, request):
+        serializer = ChatMessageSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        events = SupportService().stream_chat_message(
+            user=request.user,
+            message=serializer.validated_data['message'],
+            session_id=serializer.validated_data.get('session_id'),
+            url=serializer.validated_data.get('url'),
+            browser_info=serializer.validated_data.get('browser_info')
+        )
+
+        async def stream():
+            async for event, data in events:
+                payload = {'text': data} if event == 'token' else data
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+        content = stream()
+        if isinstance(request._request, WSGIRequest):
+            content = iterate_in_new_loop(content)
+        response = StreamingHttpResponse(content, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+class ProblemReportView(AsyncAPIView):
     """API for problem reporting"""
     permission_classes = [permissions.IsAuthenticated]
     
@@ -1,17 +1,23 @@
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from .models import TrainingSession, TrainingLesson
-from .services import TrainingService
+from .services import TrainingService, LessonAudioService, ReviewScheduler
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 class TrainingConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.session_id = None
         self.service = TrainingService()
+        self.audio_service = LessonAudioService()
         self.current_lesson = None
         self.is_interrupted = False
+        self.current_question = 0
+        self.voice_task = None
 
     async def connect(self):
         self.session_id = self.scope['url_route']['kwargs']['session_id']
@@ -21,8 +27,21 @@ class TrainingConsumer(AsyncWebsocketConsumer):
         )
         await self.accept()
 
+        try:
+            state = await self.service.get_session_state(self.session_id)
+        except TrainingSession.DoesNotExist:
+            await self.send_error('Training session not found')
+            await self.close(code=4404)
+            return
+        self.is_interrupted = state['is_paused']
+        self.current_question = state['current_question']
+        self.service.state.ensure_flusher()
+
     async def disconnect(self, close_code):
+        if self.voice_task and not self.voice_task.done():
+            self.voice_task.cancel()
         if self.session_id:
+            await self.service.flush_session_state(self.session_id)
             await self.channel_layer.group_discard(
                 f"training_{self.session_id}",
                 self.channel_name
@@ -50,6 +69,7 @@ class TrainingConsumer(AsyncWebsocketConsumer):
     async def handle_start_lesson(self, data):
         lesson_id = data.get('lesson_id')
         self.current_lesson = await self.get_lesson(lesson_id)
+        self.current_lesson.current_question = self.current_question
         
         # Start the lesson content
         await self.send_lesson_content()
@@ -70,8 +90,9 @@ class TrainingConsumer(AsyncWebsocketConsumer):
             response,
             audio_data
         )
+        await self.record_review(analysis.get('correctness', 0))
 
-        # Get next content based on response
+        # Get next content based on response; moving on advances current_lesson.current_question
         next_content = await self.service.get_next_content(
             self.current_lesson,
             analysis
@@ -81,6 +102,24 @@ class TrainingConsumer(AsyncWebsocketConsumer):
         await self.send_response_analysis(analysis)
         await self.send_next_content(next_content)
 
+        if not next_content['should_repeat']:
+            self.current_question = self.current_lesson.current_question
+            await self.service.set_current_question(self.session_id, self.current_question)
+
+        # Questions are static, so their narration is already rendered; the
+        # end-of-lesson message is not, and is left to the text channel.
+        if next_content['type'] == 'next':
+            segment = self.question_segment(self.current_question)
+            if segment is not None:
+                self.start_voice_task(self.stream_audio(segment))
+
+    def question_segment(self, index):
+        """The narration segment for question `index`, resolved the way get_segments renders it"""
+        for segment in self.audio_service.get_segments(self.current_lesson):
+            if segment['kind'] == 'question' and segment['index'] == index:
+                return segment
+        return None
+
     async def handle_interrupt(self):
         self.is_interrupted = True
         await self.service.pause_session(self.session_id)
@@ -99,6 +138,62 @@ class TrainingConsumer(AsyncWebsocketConsumer):
         )
         await self.send_question_answer(answer)
 
+    async def start_voice_interaction(self):
+        """Stream the lesson narration in the background so interrupts stay responsive"""
+        self.start_voice_task(self.narrate_lesson())
+
+    def start_voice_task(self, coroutine):
+        """Replace any narration still playing with `coroutine`, run in the background"""
+        if self.voice_task and not self.voice_task.done():
+            self.voice_task.cancel()
+        self.voice_task = asyncio.create_task(coroutine)
+        self.voice_task.add_done_callback(self._voice_task_done)
+
+    def _voice_task_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error streaming lesson audio for session {self.session_id}: {task.exception()!r}")
+
+    async def narrate_lesson(self):
+        segments = self.audio_service.get_segments(self.current_lesson)
+        content = [segment for segment in segments if segment['kind'] == 'content']
+        questions = [segment for segment in segments if segment['kind'] == 'question']
+        for segment in content + questions[:1]:
+            if self.is_interrupted:
+                break
+            await self.stream_audio(segment)
+
+    async def stream_audio(self, segment):
+        """Send a pre-rendered audio file as binary frames between start/end markers"""
+        text = segment['text']
+        if not await asyncio.to_thread(self.audio_service.is_rendered, text):
+            # The render pipeline hasn't caught up with this text yet; render it once
+            # so every later session reads it from storage.
+            await asyncio.to_thread(self.audio_service.render_text, text)
+
+        await self.send_json({
+            'type': 'audio_start',
+            'kind': segment['kind'],
+            'index': segment.get('index')
+        })
+        stream = self.audio_service.open_stream(text)
+        while True:
+            chunk = await asyncio.to_thread(next, stream, None)
+            if chunk is None:
+                break
+            await self.send(bytes_data=chunk)
+        await self.send_json({
+            'type': 'audio_end',
+            'kind': segment['kind'],
+            'index': segment.get('index')
+        })
+
+    @database_sync_to_async
+    def record_review(self, score):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            return
+        ReviewScheduler.record_review(user, self.current_lesson, score, self.current_question)
+
     @database_sync_to_async
     def get_lesson(self, lesson_id):
         return TrainingLesson.objects.get(id=lesson_id)
@@ -0,0 +1,151 @@
+import json
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from training.models import TrainingLesson
+
+DIFFICULTIES = {choice for choice, _ in TrainingLesson.DIFFICULTY_CHOICES}
+
+class Command(BaseCommand):
+    help = 'Bulk import a lesson catalog from a JSON-lines or YAML file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file (.jsonl, .yaml or .yml)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and diff without writing')
+        parser.add_argument('--strict', action='store_true', help='Abort on the first invalid record')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'duplicate': 0, 'invalid': 0}
+        seen_hashes = set()
+
+        records = self.validated(self.read_records(options['path']), stats, options['strict'])
+        while True:
+            batch = []
+            for record in islice(records, options['batch_size']):
+                if record['content_hash'] in seen_hashes:
+                    stats['duplicate'] += 1
+                    continue
+                seen_hashes.add(record['content_hash'])
+                batch.append(record)
+            if not batch:
+                break
+            self.write_batch(batch, stats, options['dry_run'])
+
+        elapsed = time.monotonic() - started
+        total = sum(stats.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {total} records in {elapsed:.1f}s ({total / max(elapsed, 1e-6):.0f}/s): "
+            + ', '.join(f"{count} {name}" for name, count in stats.items())
+        ))
+        if stats['created'] or stats['updated']:
+            self.stdout.write('Run `manage.py render_lesson_audio` to narrate new and changed lessons.')
+
+    def read_records(self, path):
+        """Yield (location, record) pairs without loading the whole file"""
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise CommandError('PyYAML is required to import YAML catalogs')
+            with open(path, encoding='utf-8') as catalog:
+                for doc_number, document in enumerate(yaml.safe_load_all(catalog), start=1):
+                    items = document if isinstance(document, list) else [document]
+                    for item_number, item in enumerate(items, start=1):
+                        yield f"document {doc_number} item {item_number}", item
+            return
+
+        with open(path, encoding='utf-8') as catalog:
+            for line_number, line in enumerate(catalog, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield f"line {line_number}", json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield f"line {line_number}", e
+
+    def validated(self, records, stats, strict):
+        for location, record in records:
+            errors = self.validate(record)
+            if errors:
+                stats['invalid'] += 1
+                message = f"{location}: {'; '.join(errors)}"
+                if strict:
+                    raise CommandError(message)
+                self.stderr.write(message)
+                continue
+            lesson = {
+                'topic': record['topic'].strip(),
+                'content': record['content'],
+                'questions': record.get('questions', []),
+                'duration': record['duration'],
+                'objectives': record.get('objectives', []),
+                'difficulty': record['difficulty'],
+            }
+            lesson['content_hash'] = TrainingLesson.compute_content_hash(lesson)
+            lesson['narration_hash'] = TrainingLesson.compute_narration_hash(lesson['content'], lesson['questions'])
+            yield lesson
+
+    def validate(self, record):
+        if isinstance(record, Exception):
+            return [f"invalid JSON ({record})"]
+        if not isinstance(record, dict):
+            return ['record must be an object']
+
+        errors = []
+        for field in ('topic', 'content'):
+            if not isinstance(record.get(field), str) or not record[field].strip():
+                errors.append(f"{field} must be a non-empty string")
+        if not isinstance(record.get('duration'), int) or record['duration'] <= 0:
+            errors.append('duration must be a positive integer')
+        if record.get('difficulty') not in DIFFICULTIES:
+            errors.append(f"difficulty must be one of {', '.join(sorted(DIFFICULTIES))}")
+        for field in ('questions', 'objectives'):
+            if not isinstance(record.get(field, []), list):
+                errors.append(f"{field} must be a list")
+        if isinstance(record.get('topic'), str) and len(record['topic']) > 255:
+            errors.append('topic must be at most 255 characters')
+        return errors
+
+    def write_batch(self, batch, stats, dry_run):
+        """Create new topics and update changed ones; lessons are matched by topic"""
+        by_topic = {record['topic']: record for record in batch}
+        stats['duplicate'] += len(batch) - len(by_topic)
+        batch = list(by_topic.values())
+
+        existing = {
+            lesson.topic: lesson
+            for lesson in TrainingLesson.objects.filter(
+                topic__in=[record['topic'] for record in batch]
+            ).only('id', 'topic', 'content_hash')
+        }
+
+        to_create, to_update = [], []
+        now = timezone.now()
+        for record in batch:
+            lesson = existing.get(record['topic'])
+            if lesson is None:
+                to_create.append(TrainingLesson(**record))
+            elif lesson.content_hash == record['content_hash']:
+                stats['unchanged'] += 1
+            else:
+                for field, value in record.items():
+                    setattr(lesson, field, value)
+                lesson.updated_at = now
+                to_update.append(lesson)
+
+        stats['created'] += len(to_create)
+        stats['updated'] += len(to_update)
+        if dry_run:
+            return
+
+        # bulk_create/bulk_update skip save() and signals, so the hashes are set above
+        with transaction.atomic():
+            TrainingLesson.objects.bulk_create(to_create)
+            TrainingLesson.objects.bulk_update(
+                to_update,
+                list(TrainingLesson.HASHED_FIELDS) + ['content_hash', 'narration_hash', 'updated_at']
+            )
@@ -0,0 +1,43 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import F
+from training.models import TrainingLesson
+from training.services import LessonAudioService
+
+class Command(BaseCommand):
+    help = 'Pre-render lesson content and questions to audio files keyed by content hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lesson', type=int, action='append', help='Only render these lesson ids')
+        parser.add_argument('--pending', action='store_true', help='Only render lessons whose narration changed')
+        parser.add_argument('--concurrency', type=int, help='Maximum concurrent TTS requests')
+        parser.add_argument('--force', action='store_true', help='Re-render files that already exist')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for changed lessons (implies --pending)')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        service = LessonAudioService(concurrency=options['concurrency'])
+        while True:
+            close_old_connections()
+            lessons = TrainingLesson.objects.all()
+            if options['lesson']:
+                lessons = lessons.filter(id__in=options['lesson'])
+            if options['pending'] or options['loop']:
+                lessons = lessons.exclude(rendered_narration_hash=F('narration_hash'))
+            lessons = list(lessons)
+
+            if lessons or not options['loop']:
+                started = time.monotonic()
+                stats = asyncio.run(service.render_lessons(lessons, force=options['force']))
+                service.mark_rendered(stats['complete'])
+                elapsed = time.monotonic() - started
+
+                self.stdout.write(self.style.SUCCESS(
+                    f"Rendered {stats['rendered']}, skipped {stats['skipped']}, "
+                    f"failed {stats['failed']} segments in {elapsed:.1f}s"
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
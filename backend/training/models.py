@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+import hashlib
+import json
 
 User = get_user_model()
 
@@ -33,18 +35,47 @@ class TrainingLesson(models.Model):
         ('advanced', 'Advanced'),
     ]
     
-    topic = models.CharField(max_length=255)
+    HASHED_FIELDS = ('topic', 'content', 'questions', 'duration', 'objectives', 'difficulty')
+
+    topic = models.CharField(max_length=255, db_index=True)
     content = models.TextField()
     questions = models.JSONField(default=list)
     duration = models.IntegerField(help_text="Duration in minutes")
     objectives = models.JSONField(default=list)
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    # Narration is re-rendered by `render_lesson_audio --pending` while these differ
+    narration_hash = models.CharField(max_length=64, blank=True, editable=False)
+    rendered_narration_hash = models.CharField(max_length=64, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.topic
 
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash(
+            {field: getattr(self, field) for field in self.HASHED_FIELDS}
+        )
+        self.narration_hash = self.compute_narration_hash(self.content, self.questions)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def compute_content_hash(cls, data):
+        """Stable hash of the lesson fields, used to skip unchanged catalog rows"""
+        payload = json.dumps(
+            {field: data.get(field) for field in cls.HASHED_FIELDS},
+            sort_keys=True,
+            separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def compute_narration_hash(content, questions):
+        """Hash of the only fields that are narrated, so other edits don't trigger a re-render"""
+        payload = json.dumps([content, questions], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
 class TrainingSession(models.Model):
     """Model for training sessions"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -92,3 +123,53 @@ class TrainingProgress(models.Model):
         self.last_completed = timezone.now()
         self.mastered = self.average_score >= 80  # Consider mastered if average score is 80% or higher
         self.save()
+
+class ReviewSchedule(models.Model):
+    """SM-2 spaced-repetition state for a lesson, or one question within it"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_schedules')
+    lesson = models.ForeignKey(TrainingLesson, on_delete=models.CASCADE, related_name='review_schedules')
+    question_index = models.IntegerField(null=True, blank=True, help_text="Null schedules the lesson as a whole")
+    ease_factor = models.FloatField(default=2.5)
+    interval_days = models.IntegerField(default=0)
+    repetitions = models.IntegerField(default=0)
+    due_at = models.DateTimeField(default=timezone.now)
+    last_reviewed = models.DateTimeField(null=True, blank=True)
+    last_score = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'lesson', 'question_index'],
+                name='unique_review_schedule_item',
+                nulls_distinct=False
+            )
+        ]
+        indexes = [
+            # Serves "next K due for this user" as an index range scan
+            models.Index(fields=['user', 'due_at'], name='review_user_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.lesson.topic} due {self.due_at:%Y-%m-%d}"
+
+    def apply_review(self, score):
+        """Update ease, interval and due date from a 0-100 score using SM-2"""
+        quality = max(0, min(5, round(score / 20)))
+        if quality < 3:
+            self.repetitions = 0
+            self.interval_days = 1
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval_days = 1
+            elif self.repetitions == 2:
+                self.interval_days = 6
+            else:
+                self.interval_days = round(self.interval_days * self.ease_factor)
+        self.ease_factor = max(1.3, self.ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.last_score = score
+        self.last_reviewed = timezone.now()
+        self.due_at = self.last_reviewed + timezone.timedelta(days=self.interval_days)
+        self.save()
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import TrainingModule, TrainingSession, TrainingLesson, TrainingProgress
+from .models import TrainingModule, TrainingSession, TrainingLesson, TrainingProgress, ReviewSchedule
 
 class TrainingLessonSerializer(serializers.ModelSerializer):
     class Meta:
@@ -67,4 +67,23 @@ class TrainingProgressSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'user', 'completion_count', 'average_score',
             'last_completed', 'mastered', 'created_at', 'updated_at'
-        ] 
\ No newline at end of file
+        ]
+
+class ReviewScheduleSerializer(serializers.ModelSerializer):
+    lesson_topic = serializers.CharField(source='lesson.topic', read_only=True)
+    question = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReviewSchedule
+        fields = [
+            'id', 'lesson', 'lesson_topic', 'question_index', 'question',
+            'ease_factor', 'interval_days', 'repetitions', 'due_at',
+            'last_reviewed', 'last_score'
+        ]
+        read_only_fields = fields
+
+    def get_question(self, obj):
+        questions = obj.lesson.questions
+        if obj.question_index is None or obj.question_index >= len(questions):
+            return None
+        return questions[obj.question_index]
@@ -1,16 +1,37 @@
-from .models import TrainingSession, TrainingLesson
+from .models import TrainingSession, TrainingLesson, ReviewSchedule
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
 import openai
-import elevenlabs
+from elevenlabs.client import ElevenLabs
+import hashlib
 import json
-from typing import Dict, Any, Optional
+import logging
+from typing import Dict, Any, List, Optional
 import asyncio
 from channels.db import database_sync_to_async
+from .state import SessionStateManager
+
+logger = logging.getLogger(__name__)
+
+def get_audio_config() -> Dict[str, Any]:
+    """Return the lesson audio settings merged over their defaults"""
+    config = {
+        'VOICE': 'Rachel',
+        'MODEL': 'eleven_monolingual_v1',
+        'STORAGE_PREFIX': 'lesson_audio',
+        'CONCURRENCY': 4,
+        'CHUNK_SIZE': 64 * 1024,
+    }
+    config.update(getattr(settings, 'TRAINING_AUDIO_CONFIG', {}))
+    return config
 
 class TrainingService:
     def __init__(self):
         self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        elevenlabs.set_api_key(settings.ELEVENLABS_API_KEY)
+        self.state = SessionStateManager()
 
     async def analyze_response(self, lesson: TrainingLesson, response: str, audio_data: Optional[bytes] = None) -> Dict[str, Any]:
         """Analyze user's response using OpenAI"""
@@ -47,7 +68,9 @@ class TrainingService:
                 'should_repeat': True
             }
         else:
-            # Move to next question or section
+            # Move to next question or section; advanced here, once, so the text and
+            # the narration the consumer streams both refer to the new question
+            lesson.current_question += 1
             return {
                 'type': 'next',
                 'content': await self.get_next_question(lesson),
@@ -81,7 +104,7 @@ class TrainingService:
         current_index = lesson.current_question
         
         if current_index < len(questions):
-            return questions[current_index]
+            return LessonAudioService.question_text(questions[current_index])
         else:
             return "You have completed all questions in this lesson."
 
@@ -106,27 +129,28 @@ class TrainingService:
         return completion.choices[0].message.content
 
     async def generate_voice_response(self, text: str) -> bytes:
-        """Generate voice response using ElevenLabs"""
-        audio = elevenlabs.generate(
-            text=text,
-            voice="Rachel",
-            model="eleven_monolingual_v1"
-        )
-        return audio
+        """Generate voice response, reusing the pre-rendered file when one exists"""
+        return await LessonAudioService().get_or_render(text)
 
-    @database_sync_to_async
-    def pause_session(self, session_id: str):
+    async def pause_session(self, session_id: str):
         """Pause the training session"""
-        session = TrainingSession.objects.get(id=session_id)
-        session.is_paused = True
-        session.save()
+        await self.state.update(session_id, is_paused=True)
 
-    @database_sync_to_async
-    def resume_session(self, session_id: str):
+    async def resume_session(self, session_id: str):
         """Resume the training session"""
-        session = TrainingSession.objects.get(id=session_id)
-        session.is_paused = False
-        session.save()
+        await self.state.update(session_id, is_paused=False)
+
+    async def get_session_state(self, session_id: str) -> Dict[str, Any]:
+        """Get the live paused flag, current question and last activity"""
+        return await self.state.get(session_id)
+
+    async def set_current_question(self, session_id: str, index: int):
+        """Record the question the learner has reached"""
+        await self.state.update(session_id, current_question=index)
+
+    async def flush_session_state(self, session_id: str = None) -> int:
+        """Write buffered session state to the database now"""
+        return await self.state.flush([session_id] if session_id else None)
 
     @database_sync_to_async
     def get_lesson_content(self, lesson: TrainingLesson) -> Dict[str, Any]:
@@ -137,4 +161,158 @@ class TrainingService:
             'questions': lesson.questions,
             'duration': lesson.duration,
             'objectives': lesson.objectives
-        } 
\ No newline at end of file
+        }
+
+class ReviewScheduler:
+    """Spaced-repetition scheduling over ReviewSchedule rows"""
+
+    @staticmethod
+    def record_review(user, lesson: TrainingLesson, score: float, question_index: Optional[int] = None) -> ReviewSchedule:
+        """Fold a new score into the item's schedule, creating it on first review"""
+        with transaction.atomic():
+            schedule, _ = ReviewSchedule.objects.select_for_update().get_or_create(
+                user=user,
+                lesson=lesson,
+                question_index=question_index
+            )
+            schedule.apply_review(score)
+        return schedule
+
+    @staticmethod
+    def due_items(user, limit: int = 10, until=None):
+        """Next `limit` items due for the user, read straight off the (user, due_at) index"""
+        return ReviewSchedule.objects.filter(
+            user=user,
+            due_at__lte=until or timezone.now()
+        ).select_related('lesson').order_by('due_at')[:limit]
+
+class LessonAudioService:
+    """Pre-renders static lesson text to audio files keyed by content hash"""
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.config = get_audio_config()
+        self.concurrency = concurrency or self.config['CONCURRENCY']
+        self._client = None
+
+    @property
+    def client(self) -> ElevenLabs:
+        if self._client is None:
+            self._client = ElevenLabs(api_key=settings.ELEVENLABS_API_KEY)
+        return self._client
+
+    @staticmethod
+    def question_text(question) -> str:
+        """Questions are stored either as plain strings or as objects with a 'question' key"""
+        text = question.get('question', '') if isinstance(question, dict) else str(question)
+        return text.strip()
+
+    @staticmethod
+    def get_segments(lesson: TrainingLesson) -> List[Dict[str, Any]]:
+        """Split a lesson into the content sections and questions that get narrated"""
+        segments = []
+        sections = [part.strip() for part in lesson.content.split('\n\n') if part.strip()]
+        for index, text in enumerate(sections):
+            segments.append({'kind': 'content', 'index': index, 'text': text})
+        for index, question in enumerate(lesson.questions):
+            text = LessonAudioService.question_text(question)
+            if text:
+                segments.append({'kind': 'question', 'index': index, 'text': text})
+        return segments
+
+    def content_hash(self, text: str) -> str:
+        """Hash the text together with the voice settings that shape the audio"""
+        key = f"{self.config['VOICE']}|{self.config['MODEL']}|{text}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def storage_path(self, text: str) -> str:
+        digest = self.content_hash(text)
+        return f"{self.config['STORAGE_PREFIX']}/{digest[:2]}/{digest}.mp3"
+
+    def is_rendered(self, text: str) -> bool:
+        return default_storage.exists(self.storage_path(text))
+
+    def render_text(self, text: str, force: bool = False) -> str:
+        """Synthesize text into storage unless an identical render already exists"""
+        path = self.storage_path(text)
+        if not force and default_storage.exists(path):
+            return path
+        audio = self.client.generate(
+            text=text,
+            voice=self.config['VOICE'],
+            model=self.config['MODEL']
+        )
+        if not isinstance(audio, bytes):
+            audio = b''.join(audio)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        return default_storage.save(path, ContentFile(audio))
+
+    async def render_lessons(self, lessons, force: bool = False) -> Dict[str, Any]:
+        """Render every segment of the given lessons with bounded concurrency.
+
+        'complete' lists the lessons whose every segment is now in storage.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stats = {'rendered': 0, 'skipped': 0, 'failed': 0}
+        seen = set()
+        failed = set()
+
+        async def render(digest, text):
+            async with semaphore:
+                try:
+                    if not force and await asyncio.to_thread(self.is_rendered, text):
+                        stats['skipped'] += 1
+                        return
+                    await asyncio.to_thread(self.render_text, text, force)
+                    stats['rendered'] += 1
+                except Exception as e:
+                    stats['failed'] += 1
+                    failed.add(digest)
+                    logger.error(f"Error rendering lesson audio: {e}")
+
+        tasks = []
+        digests = {}
+        for lesson in lessons:
+            digests[lesson.id] = set()
+            for segment in self.get_segments(lesson):
+                digest = self.content_hash(segment['text'])
+                digests[lesson.id].add(digest)
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                tasks.append(render(digest, segment['text']))
+        await asyncio.gather(*tasks)
+        stats['complete'] = [lesson for lesson in lessons if not digests[lesson.id] & failed]
+        return stats
+
+    @staticmethod
+    def mark_rendered(lessons) -> int:
+        """Record the narration each lesson was rendered from, unless it changed meanwhile"""
+        updated = 0
+        for lesson in lessons:
+            updated += TrainingLesson.objects.filter(
+                id=lesson.id, narration_hash=lesson.narration_hash
+            ).update(rendered_narration_hash=lesson.narration_hash)
+        return updated
+
+    async def get_or_render(self, text: str) -> bytes:
+        """Read a pre-rendered file, rendering it once on a miss"""
+        path = await asyncio.to_thread(self.render_text, text)
+        return await asyncio.to_thread(self._read, path)
+
+    def open_stream(self, text: str):
+        """Yield the stored audio for text in chunks, or nothing if it isn't rendered"""
+        path = self.storage_path(text)
+        if not default_storage.exists(path):
+            return
+        with default_storage.open(path, 'rb') as audio_file:
+            while True:
+                chunk = audio_file.read(self.config['CHUNK_SIZE'])
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with default_storage.open(path, 'rb') as audio_file:
+            return audio_file.read()
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from channels.db import database_sync_to_async
+from .models import TrainingSession
+
+logger = logging.getLogger(__name__)
+
+# Volatile fields kept in the state store, mapped to the TrainingSession column they flush to
+STATE_FIELDS = {
+    'is_paused': 'is_paused',
+    'current_question': 'current_question',
+    'last_activity': 'updated_at',
+}
+
+def get_state_config() -> Dict[str, Any]:
+    """Return the session state settings merged over their defaults"""
+    config = {
+        'BACKEND': None,
+        'KEY_PREFIX': 'training:session',
+        'FLUSH_INTERVAL': 5,  # seconds
+        'TTL': 24 * 60 * 60,  # seconds
+    }
+    config.update(getattr(settings, 'TRAINING_SESSION_STATE', {}))
+    if not config['BACKEND']:
+        layer = getattr(settings, 'CHANNEL_LAYERS', {}).get('default', {})
+        config['BACKEND'] = 'redis' if 'Redis' in layer.get('BACKEND', '') else 'memory'
+    return config
+
+class InMemorySessionStateStore:
+    """Process-local state store, used in tests and single-process development"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self._states = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self._states.get(str(session_id))
+            return dict(state) if state is not None else None
+
+    async def load(self, session_id: str, state: Dict[str, Any]) -> None:
+        """Seed state read from the database without marking it dirty"""
+        with self._lock:
+            self._states.setdefault(str(session_id), dict(state))
+
+    async def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            self._states.setdefault(str(session_id), {}).update(fields)
+            self._dirty.add(str(session_id))
+
+    async def pop_dirty(self, session_ids=None) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            wanted = self._dirty if session_ids is None else self._dirty & {str(i) for i in session_ids}
+            dirty = {session_id: dict(self._states[session_id]) for session_id in wanted}
+            self._dirty -= set(dirty)
+            return dirty
+
+    async def mark_dirty(self, session_ids) -> None:
+        with self._lock:
+            self._dirty |= {str(i) for i in session_ids}
+
+    def overwrite(self, session_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            state = self._states.get(str(session_id))
+            if state is not None:
+                state.update(fields)
+
+class RedisSessionStateStore:
+    """State store on the same Redis instance that backs the channel layer"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.host, self.port = settings.CHANNEL_LAYERS['default']['CONFIG']['hosts'][0]
+        self.dirty_key = f"{config['KEY_PREFIX']}:dirty"
+        self._clients = weakref.WeakKeyDictionary()
+        self._sync_client = None
+
+    @property
+    def client(self):
+        """Client for the running event loop; async_to_sync runs each call on a fresh loop,
+        and pooled connections can't cross loops"""
+        import redis.asyncio as redis
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = redis.Redis(host=self.host, port=self.port)
+        return client
+
+    @property
+    def sync_client(self):
+        """Blocking client for the REST views, shared by every thread in the process"""
+        import redis
+
+        if self._sync_client is None:
+            self._sync_client = redis.Redis(host=self.host, port=self.port)
+        return self._sync_client
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.config['KEY_PREFIX']}:{session_id}"
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.hgetall(self._key(session_id))
+        if not raw:
+            return None
+        return {key.decode(): json.loads(value) for key, value in raw.items()}
+
+    async def load(self, session_id: str, state: Dict[str, Any]) -> None:
+        key = self._key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            for field, value in state.items():
+                pipe.hsetnx(key, field, json.dumps(value))
+            pipe.expire(key, self.config['TTL'])
+            await pipe.execute()
+
+    async def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        key = self._key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={field: json.dumps(value) for field, value in fields.items()})
+            pipe.expire(key, self.config['TTL'])
+            pipe.sadd(self.dirty_key, str(session_id))
+            await pipe.execute()
+
+    async def pop_dirty(self, session_ids=None) -> Dict[str, Dict[str, Any]]:
+        if session_ids is None:
+            members = await self.client.spop(self.dirty_key, 1000) or []
+            ids = [member.decode() for member in members]
+        else:
+            ids = [str(i) for i in session_ids]
+            removed = await asyncio.gather(*(self.client.srem(self.dirty_key, i) for i in ids))
+            ids = [i for i, was_dirty in zip(ids, removed) if was_dirty]
+
+        dirty = {}
+        for session_id in ids:
+            state = await self.get(session_id)
+            if state:
+                dirty[session_id] = state
+        return dirty
+
+    async def mark_dirty(self, session_ids) -> None:
+        await self.client.sadd(self.dirty_key, *[str(i) for i in session_ids])
+
+    def overwrite(self, session_id: str, fields: Dict[str, Any]) -> None:
+        key = self._key(session_id)
+        # Only sessions already cached; a cold one is loaded from the database when next read
+        if self.sync_client.exists(key):
+            self.sync_client.hset(key, mapping={field: json.dumps(value) for field, value in fields.items()})
+
+class SessionStateManager:
+    """Keeps volatile training session state off the database and writes it back in batches"""
+
+    _store = None
+    _flush_task = None
+
+    def __init__(self):
+        self.config = get_state_config()
+
+    @property
+    def store(self):
+        if SessionStateManager._store is None:
+            if self.config['BACKEND'] == 'redis':
+                SessionStateManager._store = RedisSessionStateStore(self.config)
+            else:
+                SessionStateManager._store = InMemorySessionStateStore(self.config)
+        return SessionStateManager._store
+
+    async def get(self, session_id: str) -> Dict[str, Any]:
+        """Return the live state, loading it from the database on a cold start"""
+        state = await self.store.get(session_id)
+        if state is None:
+            state = await self._load_from_db(session_id)
+            await self.store.load(session_id, state)
+        return state
+
+    async def update(self, session_id: str, **fields) -> None:
+        fields['last_activity'] = timezone.now().isoformat()
+        await self.store.update(session_id, fields)
+
+    async def flush(self, session_ids=None) -> int:
+        """Write dirty sessions back with one field-scoped UPDATE per distinct state"""
+        dirty = await self.store.pop_dirty(session_ids)
+        if dirty:
+            try:
+                await self._write(dirty)
+            except Exception:
+                # Put them back so the next flush retries instead of dropping the state
+                await self.store.mark_dirty(dirty)
+                raise
+        return len(dirty)
+
+    def sync_from_db(self, session: TrainingSession) -> None:
+        """After a direct write to the session row, update the cached copy so a later
+        flush doesn't write the old values back"""
+        self.store.overwrite(session.id, {
+            'is_paused': session.is_paused,
+            'current_question': session.current_question,
+            'last_activity': session.updated_at.isoformat(),
+        })
+
+    def ensure_flusher(self) -> None:
+        """Start the periodic flush loop on the running event loop if it isn't there yet"""
+        task = SessionStateManager._flush_task
+        if task is None or task.done():
+            SessionStateManager._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.config['FLUSH_INTERVAL'])
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing training session state: {e}")
+
+    @database_sync_to_async
+    def _load_from_db(self, session_id: str) -> Dict[str, Any]:
+        session = TrainingSession.objects.only(
+            'is_paused', 'current_question', 'updated_at'
+        ).get(id=session_id)
+        return {
+            'is_paused': session.is_paused,
+            'current_question': session.current_question,
+            'last_activity': session.updated_at.isoformat(),
+        }
+
+    @database_sync_to_async
+    def _write(self, dirty: Dict[str, Dict[str, Any]]) -> None:
+        # Most flushed sessions share a state (e.g. "paused at question 0"), so
+        # grouping on the volatile flags turns N sessions into a handful of
+        # UPDATEs. Last activity is only precise to the flush interval anyway,
+        # so each group takes its latest timestamp.
+        groups = defaultdict(list)
+        for session_id, state in dirty.items():
+            key = tuple(
+                (column, state[field]) for field, column in STATE_FIELDS.items()
+                if field != 'last_activity' and field in state
+            )
+            groups[key].append((session_id, state.get('last_activity')))
+
+        for key, members in groups.items():
+            values = dict(key)
+            timestamps = [timestamp for _, timestamp in members if timestamp]
+            if timestamps:
+                values[STATE_FIELDS['last_activity']] = parse_datetime(max(timestamps))
+            TrainingSession.objects.filter(
+                id__in=[session_id for session_id, _ in members]
+            ).update(**values)
@@ -1,3 +1,71 @@
-from django.test import TestCase
+from unittest import mock
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from .consumers import TrainingConsumer
+from .models import TrainingLesson, TrainingSession
+from .routing import websocket_urlpatterns
+from .services import TrainingService
+from .state import SessionStateManager
 
-# Create your tests here.
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    TRAINING_SESSION_STATE={'BACKEND': 'memory'},
+)
+class TrainingConsumerTests(TransactionTestCase):
+    def setUp(self):
+        SessionStateManager._store = None
+        user = get_user_model().objects.create_user(username='learner', password='secret')
+        self.lesson = TrainingLesson.objects.create(
+            topic='STAR answers',
+            content='Situation.\n\nTask.',
+            questions=['First question?', {'question': 'Second question?'}],
+            duration=10,
+            difficulty='beginner'
+        )
+        self.session = TrainingSession.objects.create(user=user, lesson=self.lesson)
+
+    def tearDown(self):
+        SessionStateManager._store = None
+
+    async def receive_type(self, communicator, message_type):
+        while True:
+            message = await communicator.receive_json_from()
+            if message['type'] == message_type:
+                return message
+
+    async def test_two_question_lesson_narrates_the_question_it_sends(self):
+        analysis = {'correctness': 90, 'key_points_missed': []}
+        with mock.patch.object(TrainingService, 'analyze_response', mock.AsyncMock(return_value=analysis)), \
+                mock.patch.object(TrainingConsumer, 'narrate_lesson', mock.AsyncMock()), \
+                mock.patch.object(TrainingConsumer, 'stream_audio', mock.AsyncMock()) as stream_audio:
+            communicator = WebsocketCommunicator(
+                URLRouter(websocket_urlpatterns), f'/ws/training/session/{self.session.id}/'
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            await communicator.send_json_to({'type': 'start_lesson', 'lesson_id': self.lesson.id})
+            await self.receive_type(communicator, 'lesson_content')
+
+            # Answering question 0 sends question 1 and narrates question 1
+            await communicator.send_json_to({'type': 'user_response', 'response': 'An answer'})
+            next_content = await self.receive_type(communicator, 'next_content')
+            self.assertEqual(next_content['content']['content'], 'Second question?')
+            await communicator.receive_nothing()
+            segment = stream_audio.await_args.args[0]
+            self.assertEqual((segment['index'], segment['text']), (1, 'Second question?'))
+
+            # Answering the last question ends the lesson right away, with nothing to narrate
+            await communicator.send_json_to({'type': 'user_response', 'response': 'Another answer'})
+            next_content = await self.receive_type(communicator, 'next_content')
+            self.assertEqual(next_content['content']['content'], 'You have completed all questions in this lesson.')
+            await communicator.receive_nothing()
+            self.assertEqual(stream_audio.await_count, 1)
+
+            await communicator.disconnect()
+
+        session = await database_sync_to_async(TrainingSession.objects.get)(id=self.session.id)
+        self.assertEqual(session.current_question, 2)
@@ -7,9 +7,11 @@ from .models import TrainingModule, TrainingSession, TrainingLesson, TrainingPro
 from .serializers import (
     TrainingModuleSerializer, TrainingSessionSerializer,
     TrainingSessionCreateSerializer, TrainingSessionUpdateSerializer,
-    TrainingLessonSerializer, TrainingProgressSerializer
+    TrainingLessonSerializer, TrainingProgressSerializer,
+    ReviewScheduleSerializer
 )
-from .services import TrainingService
+from .services import TrainingService, ReviewScheduler
+from .state import SessionStateManager
 from django.shortcuts import get_object_or_404
 from django.db import models
 
@@ -75,6 +77,7 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
         })
         session.current_question += 1
         session.save()
+        service.state.sync_from_db(session)
 
         return Response({
             'analysis': analysis,
@@ -102,16 +105,18 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
     def pause(self, request, pk=None):
         """Pause the training session"""
         session = self.get_object()
-        service = TrainingService()
-        service.pause_session(session.id)
+        session.is_paused = True
+        session.save(update_fields=['is_paused', 'updated_at'])
+        SessionStateManager().sync_from_db(session)
         return Response({'status': 'paused'})
 
     @action(detail=True, methods=['post'])
     def resume(self, request, pk=None):
         """Resume the training session"""
         session = self.get_object()
-        service = TrainingService()
-        service.resume_session(session.id)
+        session.is_paused = False
+        session.save(update_fields=['is_paused', 'updated_at'])
+        SessionStateManager().sync_from_db(session)
         return Response({'status': 'resumed'})
 
     @action(detail=True, methods=['post'])
@@ -126,6 +131,7 @@ class TrainingSessionViewSet(viewsets.ModelViewSet):
             lesson=session.lesson
         )
         progress.update_progress(session.score or 0)
+        ReviewScheduler.record_review(request.user, session.lesson, session.score or 0)
 
         return Response({'status': 'completed'})
 
@@ -155,4 +161,17 @@ class TrainingProgressViewSet(viewsets.ReadOnlyModelViewSet):
                 'intermediate': progress.filter(lesson__difficulty='intermediate').count(),
                 'advanced': progress.filter(lesson__difficulty='advanced').count()
             }
-        })
\ No newline at end of file
+        })
+
+    @action(detail=False, methods=['get'])
+    def due_reviews(self, request):
+        """Get the next lessons and questions due for review"""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 100))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        items = ReviewScheduler.due_items(request.user, limit=limit)
+        return Response(ReviewScheduleSerializer(items, many=True).data)
\ No newline at end of file